@@ -1,261 +1,1712 @@
+import gc
 import os
+import re
+import json
+import time
+import shutil
+import sqlite3
+import hmac
+import hashlib
+import logging
+import tempfile
+import functools
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict, defaultdict
 import dash
-from dash import dcc, html, Input, Output, State
-import plotly.graph_objects as go
+from dash import dcc, html, dash_table, Input, Output, State, ClientsideFunction, Patch, ctx
+from dash.exceptions import PreventUpdate
+from flask import Response, g, jsonify, request
+import plotly.io as pio
+from plotly.utils import PlotlyJSONEncoder
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
+
+from regression import (BATCHED_ESTIMATORS, SKLEARN_ESTIMATORS, batched_ols, bootstrap_own, fit_own,
+                        fit_own_sklearn, own_elasticity_at, own_response_at, predict_own, sklearn_available)
 
 # Initialize Dash app
 app = dash.Dash(__name__)
 server = app.server  # For deployment
 
-# Load and prepare data
+# Data source: DATA_PATH if set, otherwise the soda.csv bundled with the app.
+# The GitHub copy is only fetched when no local file exists.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 data_url = 'https://raw.githubusercontent.com/mknomics/teaching_intro_price_optimization/refs/heads/main/soda.csv'
-df = pd.read_csv(data_url)
-df['date'] = pd.to_datetime(df['date'])
-
-# Process data
-df_mean_Q = df.groupby(['brand','container','city','date'])['quantity'].mean().reset_index()
-df_mean_P = df.groupby(['brand','container','city','date'])['price'].mean().reset_index()
-df_city = pd.merge(df_mean_Q, df_mean_P)
-df_city.rename(columns={'quantity': 'mean_q', 'price': 'mean_p'}, inplace=True)
-df_city = df_city.pivot(index='date', columns=['city','brand','container'], values=['mean_q','mean_p'])
-
-# Available options
-brands = ['adult-cola', 'gazoza', 'kinder-cola', 'lemon-boost', 'orange-power']
-containers = ['plastic', 'can', 'glass']
-
-# Calculate price ranges for each product
-def get_price_range(brand, container):
+DATA_PATH = os.environ.get('DATA_PATH', os.path.join(BASE_DIR, 'soda.csv'))
+
+# Processed data is cached as memory-mapped .npy files keyed by a hash of the
+# source file, so later starts skip parsing and reprocessing the CSV
+DATA_CACHE_DIR = os.environ.get('DATA_CACHE_DIR', os.path.join(BASE_DIR, '.cache'))
+CACHE_FORMAT = 3
+
+# Per (city, product, date) sales statistics held as dense NumPy blocks of
+# shape (n_cities, n_products, n_dates). Only running counts and sums are
+# kept, so rows can be fed in batches with update() and each batch costs a
+# single grouped pass over the new rows.
+class SalesAggregate:
+    STATS = ('count', 'sum_p', 'sum_q', 'sumsq_p', 'sumsq_q')
+
+    def __init__(self, cities=(), products=(), dates=(), stats=None):
+        self.cities = list(cities)
+        self.products = [tuple(p) for p in products]
+        self.dates = pd.DatetimeIndex(dates, name='date')
+        self.city_codes = {c: i for i, c in enumerate(self.cities)}
+        self.product_codes = {p: i for i, p in enumerate(self.products)}
+        self.date_codes = {d: i for i, d in enumerate(self.dates)}
+        shape = (len(self.cities), len(self.products), len(self.dates))
+        self.stats = stats or {name: np.zeros(shape) for name in self.STATS}
+
+    @staticmethod
+    def _encode(keys, labels, codes):
+        return SalesAggregate._map(*pd.factorize(keys), labels, codes)
+
+    # Map batch-local codes onto the global codes, adding labels not seen yet
+    @staticmethod
+    def _map(local, uniques, labels, codes):
+        mapping = np.empty(len(uniques), dtype=np.intp)
+        for k, label in enumerate(uniques):
+            if label not in codes:
+                codes[label] = len(labels)
+                labels.append(label)
+            mapping[k] = codes[label]
+        return mapping[local]
+
+    def update(self, rows):
+        # Like groupby, rows with a missing key or value are left out
+        rows = rows.dropna(subset=['city', 'brand', 'container', 'date', 'price', 'quantity'])
+        old_shape = self.stats['count'].shape
+
+        dates = list(self.dates)
+        c = self._encode(rows['city'], self.cities, self.city_codes)
+        # Products are factorized column by column and combined as integers;
+        # factorizing (brand, container) pairs would build a tuple per row
+        b, brands = pd.factorize(rows['brand'])
+        k, containers = pd.factorize(rows['container'])
+        local, combined = pd.factorize(b * len(containers) + k)
+        pairs = [(brands[v // len(containers)], containers[v % len(containers)]) for v in combined]
+        p = self._map(local, pairs, self.products, self.product_codes)
+        d = self._encode(pd.DatetimeIndex(rows['date']), dates, self.date_codes)
+        shape = (len(self.cities), len(self.products), len(dates))
+
+        if shape != old_shape or not self.stats['count'].flags.writeable:
+            for name, block in self.stats.items():
+                grown = np.zeros(shape)
+                grown[:old_shape[0], :old_shape[1], :old_shape[2]] = block
+                self.stats[name] = grown
+
+        key = np.ravel_multi_index((c, p, d), shape)
+        price = rows['price'].to_numpy(dtype=float)
+        quantity = rows['quantity'].to_numpy(dtype=float)
+        size = int(np.prod(shape))
+        for name, weights in (('count', None), ('sum_p', price), ('sum_q', quantity),
+                              ('sumsq_p', price * price), ('sumsq_q', quantity * quantity)):
+            self.stats[name] += np.bincount(key, weights=weights, minlength=size).reshape(shape)
+
+        # Keep the date axis sorted when a batch brings earlier dates
+        self.dates = pd.DatetimeIndex(dates, name='date')
+        if not self.dates.is_monotonic_increasing:
+            order = np.argsort(self.dates.values, kind='stable')
+            self.dates = self.dates[order]
+            self.date_codes = {d: i for i, d in enumerate(self.dates)}
+            for name, block in self.stats.items():
+                self.stats[name] = np.ascontiguousarray(block[:, :, order])
+        return self
+
+    def _ratio(self, numerator, denominator):
+        out = np.full(numerator.shape, np.nan)
+        return np.divide(numerator, denominator, out=out, where=denominator > 0)
+
+    @property
+    def count(self):
+        return self.stats['count']
+
+    @property
+    def mean_p(self):
+        return self._ratio(self.stats['sum_p'], self.count)
+
+    @property
+    def mean_q(self):
+        return self._ratio(self.stats['sum_q'], self.count)
+
+    def _variance(self, total, total_sq):
+        n = self.count
+        return self._ratio(total_sq - self._ratio(total * total, n), n - 1)
+
+    @property
+    def var_p(self):
+        return self._variance(self.stats['sum_p'], self.stats['sumsq_p'])
+
+    @property
+    def var_q(self):
+        return self._variance(self.stats['sum_q'], self.stats['sumsq_q'])
+
+def prepare_data(df):
+    return SalesAggregate().update(df)
+
+def read_source(source):
+    df = pd.read_csv(source)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return f'{h.hexdigest()[:16]}-v{CACHE_FORMAT}'
+
+def save_cache(cache_path, df, sales):
+    os.makedirs(DATA_CACHE_DIR, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=DATA_CACHE_DIR)
+    try:
+        # Raw rows are stored column by column; strings become integer codes
+        raw = []
+        for i, col in enumerate(df.columns):
+            values = df[col]
+            if pd.api.types.is_datetime64_any_dtype(values):
+                kind, arr, categories = 'date', values.values.astype('M8[ns]').view('i8'), None
+            elif pd.api.types.is_numeric_dtype(values):
+                kind, arr, categories = 'num', values.to_numpy(), None
+            else:
+                # Codes are stored in the dtype pandas itself uses, so loading
+                # them as a Categorical needs no conversion copy
+                codes, uniques = pd.factorize(values)
+                codes = pd.Categorical.from_codes(codes, uniques).codes
+                kind, arr, categories = 'cat', codes, [str(u) for u in uniques]
+            np.save(os.path.join(tmp, f'raw_{i}.npy'), arr)
+            raw.append({'name': col, 'kind': kind, 'categories': categories})
+
+        for name, block in sales.stats.items():
+            np.save(os.path.join(tmp, f'sales_{name}.npy'), block)
+        np.save(os.path.join(tmp, 'sales_dates.npy'), sales.dates.values.astype('M8[ns]').view('i8'))
+        meta = {'raw': raw, 'cities': sales.cities, 'products': sales.products}
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        # Publish atomically so concurrent workers never see a partial cache
+        os.replace(tmp, cache_path)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(cache_path):
+            raise
+
+def load_cache(cache_path):
+    with open(os.path.join(cache_path, 'meta.json')) as f:
+        meta = json.load(f)
+
+    raw = {}
+    for i, col in enumerate(meta['raw']):
+        arr = np.load(os.path.join(cache_path, f'raw_{i}.npy'), mmap_mode='r')
+        if col['kind'] == 'date':
+            raw[col['name']] = arr.view('M8[ns]')
+        elif col['kind'] == 'cat':
+            raw[col['name']] = pd.Categorical.from_codes(arr, col['categories'])
+        else:
+            raw[col['name']] = arr
+    # copy=False keeps each column its own block over the memory map
+    df = pd.DataFrame(raw, copy=False)
+
+    stats = {name: np.load(os.path.join(cache_path, f'sales_{name}.npy'), mmap_mode='r')
+             for name in SalesAggregate.STATS}
+    dates = np.load(os.path.join(cache_path, 'sales_dates.npy')).view('M8[ns]')
+    sales = SalesAggregate(meta['cities'], meta['products'], dates, stats)
+    return df, sales
+
+# Remove the cache of a data version that is no longer served. Memory maps
+# still open on its files stay valid until the old snapshot is released.
+def drop_cache(version):
+    shutil.rmtree(os.path.join(DATA_CACHE_DIR, version), ignore_errors=True)
+
+# Returns the raw rows, their aggregate and a version string identifying the
+# source data, used to key anything derived from it
+def load_data(path=DATA_PATH):
+    if not os.path.exists(path):
+        df = read_source(data_url)
+        rows_hash = pd.util.hash_pandas_object(df, index=False).values.tobytes()
+        return df, prepare_data(df), hashlib.sha256(rows_hash).hexdigest()[:16]
+
+    version = file_digest(path)
+    cache_path = os.path.join(DATA_CACHE_DIR, version)
+    if os.path.isdir(cache_path):
+        try:
+            return load_cache(cache_path) + (version,)
+        except (OSError, ValueError, KeyError):
+            pass  # Unreadable cache, rebuild it below
+
+    df = read_source(path)
+    sales = prepare_data(df)
     try:
-        prices = df_city['mean_p']['Athens'][brand][container].values
-        return float(np.min(prices)), float(np.max(prices))
-    except:
-        return 0.5, 5.0  # Default range if error
-
-# App layout
-app.layout = html.Div([
-    html.Div([
-        html.H1('Newberry College', style={'textAlign': 'center', 'color': 'crimson', 'fontSize': '48px', 'fontWeight': 'bold', 'marginBottom': '10px'}),
-        html.H1('Elasticity Analysis Tool', style={'textAlign': 'center', 'color': '#2c3e50'}),
-        html.P('Athens Soda Market Data Analysis', style={'textAlign': 'center', 'fontSize': '18px', 'color': '#7f8c8d'}),
-        html.Hr()
-    ]),
-
-    # Main content with two columns
-    html.Div([
-        # Left column - Own Price Elasticity
+        save_cache(cache_path, df, sales)
+    except OSError:
+        pass  # Read-only filesystem, run uncached
+    return df, sales, version
+
+# Zero-copy access to the per-date mean series. Quantity and price series are
+# the rows of one contiguous, read-only 2-D array, located through a
+# precomputed (city, brand, container) -> row map.
+class SeriesAccessor:
+    def __init__(self, sales):
+        self.dates = sales.dates
+        self.cities = list(sales.cities)
+        self.products = list(sales.products)
+        self.city_codes = dict(sales.city_codes)
+        self.product_codes = dict(sales.product_codes)
+        self.keys = [(city, brand, container) for city in self.cities
+                     for brand, container in self.products]
+        self.positions = {key: k for k, key in enumerate(self.keys)}
+        n = len(self.keys)
+        self.values = np.ascontiguousarray(np.concatenate(
+            [sales.mean_q.reshape(n, -1), sales.mean_p.reshape(n, -1)]))
+        self.values.flags.writeable = False
+        self.price_offset = n
+
+    def quantity(self, brand, container, city):
+        return self.values[self.positions[(city, brand, container)]]
+
+    def price(self, brand, container, city):
+        return self.values[self.price_offset + self.positions[(city, brand, container)]]
+
+    def city_block(self, city):
+        # (n_products, n_dates) quantity and price views for one city
+        c, n = self.city_codes[city], len(self.products)
+        rows = slice(c * n, (c + 1) * n)
+        return self.values[rows], self.values[self.price_offset:][rows]
+
+# Own-price estimators offered in the UI
+estimators = dict(BATCHED_ESTIMATORS)
+if sklearn_available():
+    estimators.update(SKLEARN_ESTIMATORS)
+
+BOOTSTRAP_REPLICATES = int(os.environ.get('BOOTSTRAP_REPLICATES', 1000))
+PRICE_GRID_POINTS = int(os.environ.get('PRICE_GRID_POINTS', 256))
+
+# Price sliders span the observed price range scaled by these factors; keep in
+# step with updatePriceSlider in assets/clientside.js
+SLIDER_PADDING = (0.8, 1.2)
+
+# Predicted quantity, elasticity and revenue on an evenly spaced price grid
+# across each row's slider range. Arrays are (..., PRICE_GRID_POINTS) and
+# contiguous, so a slider position resolves by interpolating between two
+# neighbouring grid points, and the revenue-maximizing grid point of every row
+# is found once, when the table is built. `response(grid)` returns the
+# (quantity, elasticity, revenue) arrays.
+class PriceResponse:
+    def __init__(self, price_min, price_max, response, points=PRICE_GRID_POINTS):
+        with np.errstate(all='ignore'):
+            self.low = price_min * SLIDER_PADDING[0]
+            self.step = (price_max * SLIDER_PADDING[1] - self.low) / (points - 1)
+            self.grid = self.low[..., None] + self.step[..., None] * np.arange(points)
+            self.quantity, self.elasticity, self.revenue = (np.ascontiguousarray(a) for a in response(self.grid))
+        self.best = np.argmax(np.where(np.isfinite(self.revenue), self.revenue, -np.inf), axis=-1)
+        for a in (self.grid, self.quantity, self.elasticity, self.revenue):
+            a.flags.writeable = False
+
+    # (quantity, elasticity, revenue) at a price on the row's slider range,
+    # or None outside it. Elasticity is interpolated as elasticity * quantity
+    # (p dQ/dp) over quantity, which is exact for the linear and log-log
+    # models and stays finite next to a zero crossing of a linear demand line.
+    def at(self, row, price):
+        last = self.grid.shape[-1] - 1
+        t = (price - self.low[row]) / self.step[row]
+        if not -1e-6 <= t <= last + 1e-6:
+            return None
+        k = min(max(int(t), 0), last - 1)
+        w = min(max(t - k, 0.0), 1.0)
+        q, e = self.quantity[row][k:k + 2], self.elasticity[row][k:k + 2]
+        quantity = q[0] + w * (q[1] - q[0])
+        response = e[0] * q[0] + w * (e[1] * q[1] - e[0] * q[0])
+        return float(quantity), float(response / quantity), float(price * quantity)
+
+    # Revenue-maximizing grid point of a row as (price, quantity, revenue,
+    # interior); interior is False when the maximum sits on the end of the
+    # range, i.e. revenue is still rising there
+    def optimum(self, row):
+        k = self.best[row]
+        return (float(self.grid[row][k]), float(self.quantity[row][k]), float(self.revenue[row][k]),
+                bool(0 < k < self.grid.shape[-1] - 1))
+
+# Fitted elasticity models, built once per dataset load so callbacks only do
+# a lookup and a few flops instead of refitting on every click. Arrays are
+# indexed [city, product] (and [city, product, product] for cross models);
+# each city's regressions are fitted together in one batched solve.
+class ModelStore:
+    def __init__(self, series, memo_size=16, fit_memo_size=512):
+        self.cities = series.cities
+        self.products = series.products
+        self.city_codes = series.city_codes
+        self.index = series.product_codes
+        C, n = len(self.cities), len(self.products)
+
+        # Own-price models for each estimator, as (coef, intercept) arrays;
+        # the linear ones, Q = intercept + coef * P, are also own_coef and
+        # own_intercept
+        self.own_fits = {name: (np.full((C, n), np.nan), np.full((C, n), np.nan)) for name in BATCHED_ESTIMATORS}
+        self.own_coef, self.own_intercept = self.own_fits['linear']
+        self.price_min = np.full((C, n), np.nan)
+        self.price_max = np.full((C, n), np.nan)
+        self.price_mean = np.full((C, n), np.nan)
+        self.price_median = np.full((C, n), np.nan)
+        self.price_latest = np.full((C, n), np.nan)
+
+        # Cross-price models for every ordered pair (i, j):
+        # Q_i = intercept + coef[..., 0] * P_i + coef[..., 1] * P_j
+        self.cross_coef = np.full((C, n, n, 2), np.nan)
+        self.cross_intercept = np.full((C, n, n), np.nan)
+
+        for c, city in enumerate(self.cities):
+            Q, P = series.city_block(city)
+            valid = np.isfinite(Q) & np.isfinite(P)
+
+            for name, (own_coef, own_intercept) in self.own_fits.items():
+                own_coef[c], own_intercept[c] = fit_own(name, P, Q, valid)
+            self.price_min[c] = np.min(P, axis=1, initial=np.inf, where=valid)
+            self.price_max[c] = np.max(P, axis=1, initial=-np.inf, where=valid)
+            self.price_mean[c] = np.where(valid, P, 0.0).sum(axis=1) / np.maximum(valid.sum(axis=1), 1)
+            with np.errstate(invalid='ignore'):
+                self.price_median[c] = np.nanmedian(np.where(valid, P, np.nan), axis=1)
+            last = valid.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+            self.price_latest[c] = np.where(valid.any(axis=1), P[np.arange(n), last], np.nan)
+
+            # All n x n pairs for this city as one stack of 2-feature fits
+            X = np.stack(np.broadcast_arrays(P[:, None, :], P[None, :, :]), axis=-1)
+            pair_valid = valid[:, None, :] & valid[None, :, :]
+            coef, intercept = batched_ols(X, np.broadcast_to(Q[:, None, :], pair_valid.shape),
+                                          pair_valid)
+            self.cross_coef[c] = coef
+            self.cross_intercept[c] = intercept
+
+        self.series = series
+        self._matrices = {}
+        self._tables = OrderedDict()
+        self._bootstraps = OrderedDict()
+        self._sklearn_fits = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self.memo_size = memo_size
+        self.fit_memo_size = fit_memo_size
+
+    def _lookup(self, brand, container, city):
+        c = self.city_codes[city]
+        i = self.index[(brand, container)]
+        if np.isnan(self.own_coef[c, i]):
+            raise KeyError((city, brand, container))
+        return c, i
+
+    def price_range(self, brand, container, city):
+        c, i = self._lookup(brand, container, city)
+        return float(self.price_min[c, i]), float(self.price_max[c, i])
+
+    # Observed (price, quantity) pairs of one series
+    def _own_series(self, c, i):
+        Q, P = self.series.city_block(self.cities[c])
+        valid = np.isfinite(Q[i]) & np.isfinite(P[i])
+        return P[i][valid], Q[i][valid]
+
+    # (coef, intercept) of an own-price model; scikit-learn estimators are
+    # fitted on first use and memoized
+    def _own_params(self, c, i, estimator):
+        if estimator in self.own_fits:
+            coef, intercept = self.own_fits[estimator]
+            return coef[c, i], intercept[c, i]
+        return self._memo(self._sklearn_fits, (c, i, estimator), self.fit_memo_size,
+                          lambda: fit_own_sklearn(estimator, *self._own_series(c, i)))
+
+    # Values built on first use and kept in a bounded memo, least recently
+    # used dropped first. Price-response tables are kept up to memo_size,
+    # per-product fits and bootstraps up to fit_memo_size.
+    def _memo(self, memo, key, size, build):
+        with self._memo_lock:
+            if key in memo:
+                memo.move_to_end(key)
+                return memo[key]
+        value = build()
+        with self._memo_lock:
+            memo[key] = value
+            while len(memo) > size:
+                memo.popitem(last=False)
+        return value
+
+    def _table(self, key, build):
+        return self._memo(self._tables, key, self.memo_size, build)
+
+    # Own-price response table holding a product, and its row. Batched
+    # estimators get one table per city; scikit-learn ones one per product, so
+    # only the product asked for is fitted.
+    def own_table(self, c, i, estimator='linear'):
+        if estimator in self.own_fits:
+            coef, intercept = (a[c][:, None] for a in self.own_fits[estimator])
+            return self._table(('own', c, estimator), lambda: PriceResponse(
+                self.price_min[c], self.price_max[c], lambda p: own_response_at(estimator, coef, intercept, p))), i
+        coef, intercept = self._own_params(c, i, estimator)
+        return self._table(('own', c, i, estimator), lambda: PriceResponse(
+            self.price_min[c, i:i + 1], self.price_max[c, i:i + 1],
+            lambda p: own_response_at(estimator, coef, intercept, p))), 0
+
+    # Cross-price response tables of a city: row (i, j) is the demand for
+    # product i, at its mean price, against the price of product j; revenue is
+    # product i's
+    def cross_table(self, c):
+        def response(p):
+            b1, b2 = self.cross_coef[c, ..., 0, None], self.cross_coef[c, ..., 1, None]
+            quantity = self.cross_intercept[c, ..., None] + b1 * self.price_mean[c, :, None, None] + b2 * p
+            return quantity, b2 * p / quantity, self.price_mean[c, :, None, None] * quantity
+
+        n = len(self.products)
+        return self._table(('cross', c), lambda: PriceResponse(
+            np.broadcast_to(self.price_min[c], (n, n)), np.broadcast_to(self.price_max[c], (n, n)), response))
+
+    # (elasticity, quantity, revenue) at a price, interpolated from the
+    # response table on the slider range and evaluated directly outside it
+    def own_response(self, brand, container, price_point, city, estimator='linear'):
+        c, i = self._lookup(brand, container, city)
+        table, row = self.own_table(c, i, estimator)
+        response = table.at(row, price_point)
+        if response is None:
+            response = own_response_at(estimator, *self._own_params(c, i, estimator), price_point)
+        quantity, elasticity, revenue = response
+        return float(elasticity), float(quantity), float(revenue)
+
+    def own_elasticity(self, brand, container, price_point, city, estimator='linear'):
+        return self.own_response(brand, container, price_point, city, estimator)[:2]
+
+    # Revenue-maximizing price on the slider range, read off the response table
+    def own_optimum(self, brand, container, city, estimator='linear'):
+        c, i = self._lookup(brand, container, city)
+        table, row = self.own_table(c, i, estimator)
+        return table.optimum(row)
+
+    def own_line(self, brand, container, city, num=100, estimator='linear'):
+        c, i = self._lookup(brand, container, city)
+        p = np.linspace(self.price_min[c, i], self.price_max[c, i], num)
+        return p, predict_own(estimator, *self._own_params(c, i, estimator), p)
+
+    # Bootstrap replicates of an own-price fit, memoized per product and
+    # estimator; seeded by position so the same store always gives the same
+    # intervals
+    def own_bootstrap(self, brand, container, city, estimator='linear'):
+        c, i = self._lookup(brand, container, city)
+        return self._memo(self._bootstraps, (c, i, estimator), self.fit_memo_size,
+                          lambda: bootstrap_own(estimator, *self._own_series(c, i), BOOTSTRAP_REPLICATES,
+                                                seed=[c, i]))
+
+    # Percentile bootstrap confidence interval for the own-price elasticity,
+    # or None for estimators that can't be fitted in batch
+    def own_interval(self, brand, container, price_point, city, estimator='linear', level=0.95):
+        if estimator not in self.own_fits:
+            return None
+        coef, intercept = self.own_bootstrap(brand, container, city, estimator)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            draws = own_elasticity_at(estimator, coef, intercept, price_point)
+        draws = draws[np.isfinite(draws)]
+        if not len(draws):
+            return float('nan'), float('nan')
+        low, high = np.percentile(draws, [50 * (1 - level), 50 * (1 + level)])
+        return float(low), float(high)
+
+    def cross_elasticity(self, brand1, container1, brand2, container2, price_point, city):
+        c, i = self._lookup(brand1, container1, city)
+        _, j = self._lookup(brand2, container2, city)
+        response = self.cross_table(c).at((i, j), price_point)
+        if response is not None:
+            return response[1], response[0]
+        b1, b2 = self.cross_coef[c, i, j]
+        q_hat = self.cross_intercept[c, i, j] + b1 * self.price_mean[c, i] + b2 * price_point
+        return float(b2 * (price_point / q_hat)), float(q_hat)
+
+    def cross_line(self, brand1, container1, brand2, container2, city, num=100):
+        c, i = self._lookup(brand1, container1, city)
+        _, j = self._lookup(brand2, container2, city)
+        b1, b2 = self.cross_coef[c, i, j]
+        p = np.linspace(self.price_min[c, j], self.price_max[c, j], num)
+        return p, self.cross_intercept[c, i, j] + b1 * self.price_mean[c, i] + b2 * p
+
+    # Full elasticity matrix for a city: entry [i, j] is the elasticity of
+    # demand for product i with respect to the price of product j, with every
+    # product priced at its reference price under the given policy. The
+    # diagonal comes from the own-price models. Results are memoized per
+    # (city, policy) for the lifetime of this store.
+    def elasticity_matrix(self, city, policy='mean'):
+        key = (city, policy)
+        if key not in self._matrices:
+            ref = {'mean': self.price_mean, 'median': self.price_median,
+                   'latest': self.price_latest}[policy][self.city_codes[city]]
+            c = self.city_codes[city]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                b = self.cross_coef[c]
+                q_hat = self.cross_intercept[c] + b[..., 0] * ref[:, None] + b[..., 1] * ref[None, :]
+                matrix = b[..., 1] * ref[None, :] / q_hat
+                own_q = self.own_intercept[c] + self.own_coef[c] * ref
+                np.fill_diagonal(matrix, self.own_coef[c] * ref / own_q)
+            matrix.flags.writeable = False
+            self._matrices[key] = matrix
+        return self._matrices[key]
+
+price_policies = {'mean': 'Mean price', 'median': 'Median price', 'latest': 'Latest price'}
+
+# Server-side paging, filtering and sorting for the data explorer table. Each
+# column keeps a precomputed ascending sort order; categorical and date
+# columns are held as codes into a small label array, so text filters are
+# evaluated on the labels and mapped back through the codes. Filter masks and
+# the row order of each (filter, sort) combination are memoized, so turning a
+# page is a single slice of a cached index array.
+class DataExplorer:
+    COLUMNS = ('date', 'city', 'shop', 'brand', 'container', 'capacity', 'price', 'quantity')
+    OPERATORS = {'=': 'eq', '!=': 'ne', '<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge'}
+    FILTER_PATTERN = re.compile(
+        r'^\{(?P<column>[^}]+)\}\s+(?P<case>[si]?)(?P<op>>=|<=|!=|<|>|=|eq|ne|lt|le|gt|ge|contains|datestartswith)'
+        r'\s+(?P<value>.+)$')
+
+    def __init__(self, df, memo_size=64):
+        self.columns = [col for col in self.COLUMNS if col in df.columns]
+        self.size = len(df)
+        self.codes, self.labels, self.values, self.orders = {}, {}, {}, {}
+        for col in self.columns:
+            data = df[col]
+            if col == 'date':
+                codes, uniques = pd.factorize(data, sort=True)
+                labels = np.array([d.strftime('%Y-%m-%d') for d in uniques], dtype=object)
+                self.values[col] = np.asarray(uniques)
+            elif isinstance(data.dtype, pd.CategoricalDtype):
+                codes, labels = data.cat.codes.to_numpy(), data.cat.categories.to_numpy(dtype=object)
+            elif data.dtype == object:
+                codes, uniques = pd.factorize(data)
+                labels = np.asarray(uniques, dtype=object)
+            else:
+                self.values[col] = data.to_numpy()
+                self.orders[col] = self._order(self.values[col], np.isnan(self.values[col])
+                                               if self.values[col].dtype.kind == 'f' else None)
+                continue
+
+            # Sort codes by label so the order matches sorting the labels
+            rank = np.empty(len(labels), dtype=np.int64)
+            rank[np.argsort(labels, kind='stable')] = np.arange(len(labels))
+            self.codes[col], self.labels[col] = codes, labels
+            self.orders[col] = self._order(np.where(codes >= 0, rank[codes], 0), codes < 0)
+
+        self.memo_size = memo_size
+        self._masks = OrderedDict()
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Ascending order with missing values last, and how many are not missing
+    @staticmethod
+    def _order(keys, missing=None):
+        order = np.argsort(keys, kind='stable')
+        if missing is None:
+            return order, len(order)
+        order = np.concatenate([order[~missing[order]], np.flatnonzero(missing)])
+        return order, len(order) - int(missing.sum())
+
+    def _memo(self, memo, key, compute):
+        with self._lock:
+            if key in memo:
+                memo.move_to_end(key)
+                return memo[key]
+        value = compute()
+        with self._lock:
+            memo[key] = value
+            while len(memo) > self.memo_size:
+                memo.popitem(last=False)
+        return value
+
+    def sort_order(self, column, direction='asc'):
+        order, valid = self.orders[column]
+        if direction == 'desc':
+            return np.concatenate([order[:valid][::-1], order[valid:]])
+        return order
+
+    # Boolean mask for one `{column} op value` clause of a DataTable filter
+    # query, or None when the clause can't be parsed
+    def filter_mask(self, clause):
+        match = self.FILTER_PATTERN.match(clause.strip())
+        if match is None or match['column'] not in self.columns:
+            return None
+        return self._memo(self._masks, clause.strip(), lambda: self._compute_mask(**match.groupdict()))
+
+    def _compute_mask(self, column, case, op, value):
+        op = self.OPERATORS.get(op, op)
+        value = value.strip()
+        if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'`':
+            value = value[1:-1]
+
+        if op in ('contains', 'datestartswith'):
+            if column in self.labels:
+                labels = self.labels[column]
+            else:
+                labels = self.values[column].astype(str)
+            if case == 'i':
+                labels, value = np.char.lower(labels.astype(str)), value.lower()
+            hits = np.char.startswith(labels.astype(str), value) if op == 'datestartswith' \
+                else np.char.find(labels.astype(str), value) >= 0
+            if column not in self.labels:
+                return hits
+            return self._from_codes(column, hits)
+
+        compare = getattr(np.ndarray, f'__{op}__')
+        try:
+            if column == 'date':
+                return self._from_codes(column, compare(self.values[column], np.datetime64(pd.Timestamp(value))))
+            if column in self.labels:
+                labels = self.labels[column]
+                if case == 'i':
+                    labels, value = np.char.lower(labels.astype(str)), value.lower()
+                return self._from_codes(column, compare(labels.astype(str), value))
+            return compare(self.values[column], float(value))
+        except ValueError:
+            return np.zeros(self.size, dtype=bool)
+
+    def _from_codes(self, column, hits):
+        codes = self.codes[column]
+        return np.append(hits, False)[codes]  # code -1 (missing) never matches
+
+    # Row positions matching every clause of the filter query, in sort order
+    def rows(self, filter_query='', sort_by=None):
+        clauses = tuple(part for part in (filter_query or '').split(' && ') if part.strip())
+        sort = tuple((s['column_id'], s['direction']) for s in (sort_by or []) if s['column_id'] in self.columns)
+        return self._memo(self._rows, (clauses, sort), lambda: self._compute_rows(clauses, sort))
+
+    def _compute_rows(self, clauses, sort):
+        mask = None
+        for clause in clauses:
+            part = self.filter_mask(clause)
+            if part is not None:
+                mask = part if mask is None else mask & part
+
+        if sort:
+            order = self.sort_order(*sort[0])
+            rows = order if mask is None else order[mask[order]]
+        else:
+            rows = np.arange(self.size) if mask is None else np.flatnonzero(mask)
+        rows.flags.writeable = False
+        return rows
+
+    def page(self, page_current, page_size, filter_query='', sort_by=None):
+        rows = self.rows(filter_query, sort_by)
+        page_count = max(-(-len(rows) // page_size), 1)
+        page_current = min(page_current or 0, page_count - 1)
+        index = rows[page_current * page_size:(page_current + 1) * page_size]
+
+        data = {}
+        for col in self.columns:
+            if col in self.labels:
+                data[col] = np.append(self.labels[col], None)[self.codes[col][index]].tolist()
+            else:
+                data[col] = self.values[col][index].tolist()
+        records = [dict(zip(data, row)) for row in zip(*data.values())]
+        return records, page_current, page_count, len(rows)
+
+# Observed price range of every fitted product, nested city -> brand ->
+# container -> [min, max]. Sent to the browser once for the slider callbacks.
+def price_range_table(models):
+    table = {}
+    for c, city in enumerate(models.cities):
+        for i, (brand, container) in enumerate(models.products):
+            if not np.isnan(models.own_coef[c, i]):
+                table.setdefault(city, {}).setdefault(brand, {})[container] = [
+                    float(models.price_min[c, i]), float(models.price_max[c, i])]
+    return table
+
+# Everything derived from one version of the dataset: the raw rows, the
+# aggregated series, fitted models, the explorer indexes and the layout's
+# option lists. A snapshot is never modified once built; a reload builds a new
+# one and swaps the module-level `snapshot` reference in a single assignment.
+# Callbacks read `snapshot` once and use that local reference throughout, so
+# requests already running finish on the version they started with, and
+# cached responses are keyed by the snapshot version.
+class DataSnapshot:
+    def __init__(self, df, sales, version):
+        self.df = df
+        self.sales = sales
+        self.version = version
+        self.series = SeriesAccessor(sales)
+        self.models = ModelStore(self.series)
+        self.explorer = DataExplorer(df)
+        self.price_ranges = price_range_table(self.models)
+
+        # Available options
+        self.cities = self.series.cities
+        self.brands = list(dict.fromkeys(b for b, _ in self.series.products))
+        self.containers = list(dict.fromkeys(c for _, c in self.series.products))
+        self.default_city, self.default_product, self.default_partner = self._defaults()
+        self.loaded_at = time.time()
+
+    # Initial selections: the first city with fitted models, its first fitted
+    # product and, for the cross panel, a fitted product of another brand,
+    # preferring the same container
+    def _defaults(self):
+        models = self.models
+        for c, city in enumerate(models.cities):
+            fitted = [product for i, product in enumerate(models.products) if not np.isnan(models.own_coef[c, i])]
+            if fitted:
+                brand, container = fitted[0]
+                others = [p for p in fitted if p[0] != brand]
+                partner = next((p for p in others if p[1] == container), (others or fitted)[0])
+                return city, fitted[0], partner
+        return None, (None, None), (None, None)
+
+# Load and prepare data
+snapshot = DataSnapshot(*load_data())
+
+# Memoized callback responses, stored as JSON and evicted least recently used
+# first (and after RESPONSE_CACHE_TTL seconds, if set). With
+# RESPONSE_CACHE_PATH the entries live in a SQLite file shared by every worker
+# on the machine; otherwise each process keeps its own in memory. Hit and miss
+# counters are always per process.
+RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH')
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 0))
+RESPONSE_FORMAT = 4  # Bump when cached responses change shape
+
+class ResponseCache:
+    def __init__(self, max_size=1024, ttl=0, path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._local = threading.local()
+        if path:
+            with self._connect() as db:
+                db.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, '
+                           'value TEXT NOT NULL, created REAL NOT NULL, used REAL NOT NULL)')
+                db.execute('CREATE INDEX IF NOT EXISTS responses_used ON responses (used)')
+
+    def _connect(self):
+        # One connection per thread, reopened after a fork
+        if getattr(self._local, 'pid', None) != os.getpid():
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db, self._local.pid = db, os.getpid()
+        return self._local.db
+
+    def _expired(self, created, now):
+        return self.ttl > 0 and now - created > self.ttl
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        key, now = json.dumps([RESPONSE_FORMAT, key]), time.time()
+        value = None
+        if self.path:
+            try:
+                with self._connect() as db:
+                    row = db.execute('SELECT value, created FROM responses WHERE key = ?',
+                                     (key,)).fetchone()
+                    if row is not None and self._expired(row[1], now):
+                        db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    elif row is not None:
+                        db.execute('UPDATE responses SET used = ? WHERE key = ?', (now, key))
+                        value = row[0]
+            except sqlite3.Error:
+                pass  # Treat a busy or broken cache file as a miss
+        else:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and self._expired(entry[1], now):
+                    del self._entries[key]
+                elif entry is not None:
+                    self._entries.move_to_end(key)
+                    value = entry[0]
+
+        self._count(value is not None)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value):
+        key, now = json.dumps([RESPONSE_FORMAT, key]), time.time()
+        value = json.dumps(value, cls=PlotlyJSONEncoder)
+        if self.path:
+            try:
+                with self._connect() as db:
+                    db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+                               (key, value, now, now))
+                    db.execute('DELETE FROM responses WHERE key IN (SELECT key FROM responses '
+                               'ORDER BY used DESC LIMIT -1 OFFSET ?)', (self.max_size,))
+            except sqlite3.Error:
+                pass
+        else:
+            with self._lock:
+                self._entries[key] = (value, now)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+    def __len__(self):
+        if self.path:
+            try:
+                return self._connect().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            except sqlite3.Error:
+                return 0
+        return len(self._entries)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self),
+                'max_size': self.max_size}
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PATH)
+
+# Slider values are continuous; responses are cached per cent
+def quantize_price(price):
+    return round(float(price), 2)
+
+# Figures are built as plain dicts rather than go.Figure objects, which skips
+# Plotly's per-property validation. Data arrays are sent rounded to six
+# significant digits. Scatter clouds larger than FIGURE_MAX_POINTS are binned
+# onto a grid, one marker per occupied cell, so payloads stay bounded as the
+# number of dates grows.
+FIGURE_MAX_POINTS = int(os.environ.get('FIGURE_MAX_POINTS', 2000))
+
+# The default template, cut down to the trace types used here
+_template = pio.templates[pio.templates.default].to_plotly_json()
+FIGURE_TEMPLATE = {'layout': _template['layout'],
+                   'data': {k: _template['data'][k] for k in ('scatter', 'heatmap')}}
+
+def encode_array(values):
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return [None] * len(values)
+    decimals = max(0, 5 - int(np.floor(np.log10(np.abs(values[finite]).max() or 1))))
+    return [None if np.isnan(v) else v for v in np.round(values, decimals).tolist()]
+
+# Average the points falling in each cell of a grid with about max_points
+# cells; returns the binned x, y and the number of points behind each
+def bin_points(x, y, max_points):
+    side = max(int(np.sqrt(max_points)), 1)
+    cells = []
+    for values in (x, y):
+        low, high = values.min(), values.max()
+        scaled = (values - low) / (high - low) if high > low else np.zeros_like(values)
+        cells.append(np.minimum((scaled * side).astype(np.int64), side - 1))
+    _, cell, counts = np.unique(cells[0] * side + cells[1], return_inverse=True, return_counts=True)
+    return (np.bincount(cell, weights=x) / counts, np.bincount(cell, weights=y) / counts, counts)
+
+def scatter_trace(x, y, name, mode='markers', max_points=None, **style):
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    trace = {'type': 'scatter', 'mode': mode, 'name': name, **style}
+    max_points = FIGURE_MAX_POINTS if max_points is None else max_points
+    if mode == 'markers' and max_points and len(x) > max_points:
+        keep = np.isfinite(x) & np.isfinite(y)
+        x, y, counts = bin_points(x[keep], y[keep], max_points)
+        trace['name'] = f'{name} (binned)'
+        trace['customdata'] = counts.tolist()
+        trace['hovertemplate'] = '(%{x}, %{y})<br>%{customdata} points<extra></extra>'
+    trace['x'], trace['y'] = encode_array(x), encode_array(y)
+    return trace
+
+def figure_dict(traces=(), title=None, xaxis_title=None, yaxis_title=None, **layout):
+    layout = {'template': FIGURE_TEMPLATE, **layout}
+    if title is not None:
+        layout['title'] = {'text': title}
+    for axis, text in (('xaxis', xaxis_title), ('yaxis', yaxis_title)):
+        if text is not None:
+            layout[axis] = dict(layout.get(axis, {}), title={'text': text})
+    return {'data': list(traces), 'layout': layout}
+
+# plotly imports its JSON engine (orjson, if installed) on first use. Do that
+# now: concurrent first requests in a threaded worker can race the import.
+pio.to_json(figure_dict(), validate=False)
+
+# Per-callback instrumentation. Callbacks wrapped with metrics.instrument()
+# record their total time, error count and the time spent in named stages
+# (metrics.stage); the time Dash takes to serialize the response is added as
+# the 'serialize' stage once the request finishes. Everything is exposed as
+# Prometheus text on /metrics. Counters live in the process, so under gunicorn
+# each scrape reports the worker that answered it, identified by the pid in
+# elasticity_process_info. Callbacks slower than SLOW_CALLBACK_MS are logged
+# as one JSON line each.
+SLOW_CALLBACK_MS = float(os.environ.get('SLOW_CALLBACK_MS', 0))
+logger = logging.getLogger('elasticity')
+
+class Metrics:
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+    def __init__(self):
+        self.calls = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.histograms = {}  # (callback, stage) -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, callback, stage, seconds):
+        with self._lock:
+            hist = self.histograms.setdefault((callback, stage), [0] * (len(self.BUCKETS) + 2))
+            for k, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    hist[k] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+
+    def current(self):
+        return getattr(self._local, 'record', None)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = self.current()
+            if record is not None:
+                record['stages'][name] = record['stages'].get(name, 0) + time.perf_counter() - start
+
+    def error(self):
+        record = self.current()
+        if record is not None:
+            record['error'] = True
+
+    def instrument(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                # Nested instrumented calls are timed as part of the outer one
+                if self.current() is not None:
+                    return func(*args, **kwargs)
+
+                record = self._local.record = {'callback': name, 'stages': {}, 'error': False}
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except PreventUpdate:
+                    raise
+                except Exception:
+                    record['error'] = True
+                    raise
+                finally:
+                    record['stages']['total'] = time.perf_counter() - start
+                    self._local.record = None
+                    self._finish(record)
+                    self._local.last = record
+            return wrapper
+        return decorator
+
+    def _finish(self, record):
+        with self._lock:
+            self.calls[record['callback']] += 1
+            if record['error']:
+                self.errors[record['callback']] += 1
+        for stage, seconds in record['stages'].items():
+            self.observe(record['callback'], stage, seconds)
+
+    # Called after a Dash request: the time outside the callback is serialization
+    def finish_request(self, seconds):
+        record = getattr(self._local, 'last', None)
+        self._local.last = None
+        if record is None:
+            return
+        serialize = max(seconds - record['stages']['total'], 0.0)
+        self.observe(record['callback'], 'serialize', serialize)
+        if SLOW_CALLBACK_MS and seconds * 1000 > SLOW_CALLBACK_MS:
+            logger.warning(json.dumps({
+                'event': 'slow_callback',
+                'callback': record['callback'],
+                'request_ms': round(seconds * 1000, 3),
+                'stages_ms': {k: round(v * 1000, 3) for k, v in record['stages'].items()},
+                'serialize_ms': round(serialize * 1000, 3),
+                'error': record['error']
+            }))
+
+    def render(self):
+        lines = [
+            '# HELP elasticity_callback_calls_total Callback invocations.',
+            '# TYPE elasticity_callback_calls_total counter'
+        ]
+        with self._lock:
+            calls, errors = dict(self.calls), dict(self.errors)
+            histograms = {key: list(hist) for key, hist in self.histograms.items()}
+        lines += [f'elasticity_callback_calls_total{{callback="{c}"}} {n}' for c, n in sorted(calls.items())]
+        lines += ['# HELP elasticity_callback_errors_total Callback invocations that failed.',
+                  '# TYPE elasticity_callback_errors_total counter']
+        lines += [f'elasticity_callback_errors_total{{callback="{c}"}} {errors.get(c, 0)}'
+                  for c in sorted(calls)]
+
+        lines += ['# HELP elasticity_callback_stage_seconds Time spent in each callback stage.',
+                  '# TYPE elasticity_callback_stage_seconds histogram']
+        for (callback, stage), hist in sorted(histograms.items()):
+            labels = f'callback="{callback}",stage="{stage}"'
+            for bound, count in zip(self.BUCKETS, hist):
+                lines.append(f'elasticity_callback_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'elasticity_callback_stage_seconds_bucket{{{labels},le="+Inf"}} {hist[-1]}')
+            lines.append(f'elasticity_callback_stage_seconds_sum{{{labels}}} {hist[-2]}')
+            lines.append(f'elasticity_callback_stage_seconds_count{{{labels}}} {hist[-1]}')
+
+        stats = response_cache.stats()
+        lookups = stats['hits'] + stats['misses']
+        lines += [
+            '# HELP elasticity_response_cache_hits_total Response cache hits in this process.',
+            '# TYPE elasticity_response_cache_hits_total counter',
+            f'elasticity_response_cache_hits_total {stats["hits"]}',
+            '# HELP elasticity_response_cache_misses_total Response cache misses in this process.',
+            '# TYPE elasticity_response_cache_misses_total counter',
+            f'elasticity_response_cache_misses_total {stats["misses"]}',
+            '# HELP elasticity_response_cache_hit_ratio Share of response cache lookups that hit.',
+            '# TYPE elasticity_response_cache_hit_ratio gauge',
+            f'elasticity_response_cache_hit_ratio {stats["hits"] / lookups if lookups else 0.0}',
+            '# HELP elasticity_response_cache_entries Entries in the response cache.',
+            '# TYPE elasticity_response_cache_entries gauge',
+            f'elasticity_response_cache_entries {stats["size"]}',
+            '# HELP elasticity_data_snapshot_info Version of the dataset being served.',
+            '# TYPE elasticity_data_snapshot_info gauge',
+            f'elasticity_data_snapshot_info{{version="{snapshot.version}"}} 1',
+            '# HELP elasticity_data_reloads_total Dataset reloads swapped in by this process.',
+            '# TYPE elasticity_data_reloads_total counter',
+            f'elasticity_data_reloads_total {reloader.reloads}',
+            '# HELP elasticity_process_info Worker process that produced these metrics.',
+            '# TYPE elasticity_process_info gauge',
+            f'elasticity_process_info{{pid="{os.getpid()}"}} 1'
+        ]
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+
+@server.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@server.after_request
+def finish_request_timer(response):
+    if request.path.endswith('/_dash-update-component') and 'request_start' in g:
+        metrics.finish_request(time.perf_counter() - g.request_start)
+    return response
+
+@server.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Hot reload of the dataset. A reload runs load_data() and builds the new
+# snapshot on a background thread, then swaps it in; a reload that finds the
+# same data version keeps the current snapshot. Reloads are started from
+# POST /admin/reload (enabled by setting ADMIN_TOKEN) or, with
+# DATA_WATCH_INTERVAL set, whenever the file at DATA_PATH changes. Each
+# worker process holds its own snapshot, so the admin route reaches the
+# others by rewriting RELOAD_SIGNAL_PATH, which every worker's watcher polls.
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+DATA_WATCH_INTERVAL = float(os.environ.get('DATA_WATCH_INTERVAL', 0))
+RELOAD_SIGNAL_PATH = os.environ.get('RELOAD_SIGNAL_PATH', os.path.join(DATA_CACHE_DIR, 'reload-request'))
+
+class DataReloader:
+    SIGNAL_POLL = 1.0  # seconds between checks of the signal file
+
+    def __init__(self, path, interval=0, signal_path=None):
+        self.path = path
+        self.interval = interval
+        self.signal_path = signal_path
+        self.reloads = 0
+        self.error = None
+        self._thread = None
+        self._watcher = None
+        self._pending = False
+        self._lock = threading.Lock()
+        self._seen = self._signature()
+        self._signalled = self._read_signal()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Start a reload unless one is already running; returns whether it
+    # started. A request during a reload runs again once it finishes, so a
+    # change that landed mid-load is not missed.
+    def reload(self):
+        with self._lock:
+            if self.running:
+                self._pending = True
+                return False
+            self._start_reload()
+            return True
+
+    def _start_reload(self):
+        self._thread = threading.Thread(target=self._run, name='data-reload', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._load()
+        finally:
+            with self._lock:
+                if self._pending:
+                    self._pending = False
+                    self._start_reload()
+
+    def _load(self):
+        global snapshot
+        start = time.perf_counter()
+        try:
+            df, sales, version = load_data(self.path)
+            if version == snapshot.version:
+                logger.info('Data reload: version %s unchanged', version)
+                return
+            new_snapshot = DataSnapshot(df, sales, version)
+        except Exception as e:
+            self.error = f'{type(e).__name__}: {e}'
+            logger.exception('Data reload from %s failed', self.path)
+            return
+
+        old_version, snapshot = snapshot.version, new_snapshot
+        self.reloads += 1
+        self.error = None
+        drop_cache(old_version)
+        logger.info('Data reload: %s -> %s in %.2fs', old_version, version, time.perf_counter() - start)
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_signal(self):
+        if not self.signal_path:
+            return None
+        try:
+            with open(self.signal_path) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    # Ask every worker to reload by writing a fresh token to the signal file;
+    # returns whether it could be written. The caller reloads this process
+    # itself, so its own watcher skips the token.
+    def signal(self):
+        if not self.signal_path:
+            return False
+        token = f'{os.getpid()}-{time.time_ns()}'
+        try:
+            os.makedirs(os.path.dirname(self.signal_path) or '.', exist_ok=True)
+            tmp = f'{self.signal_path}.{os.getpid()}.tmp'
+            with open(tmp, 'w') as f:
+                f.write(token)
+            os.replace(tmp, self.signal_path)
+        except OSError:
+            logger.exception('Could not write reload signal %s', self.signal_path)
+            return False
+        self._signalled = token
+        return True
+
+    # Poll the signal file, and the data file when DATA_WATCH_INTERVAL is set.
+    # A changed data file is reloaded once it has stopped changing, so a file
+    # still being written is not picked up half way. Threads don't survive
+    # fork, so this is called per process (see ensure_watcher and
+    # gunicorn.conf.py).
+    def watch(self):
+        if self.interval <= 0 and not self.signal_path:
+            return
+        with self._lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._start_watcher()
+
+    def _start_watcher(self):
+        period = min(p for p in (self.interval, self.signal_path and self.SIGNAL_POLL) if p and p > 0)
+
+        def poll():
+            checked = time.monotonic()
+            while True:
+                token = self._read_signal()
+                if token is not None and token != self._signalled:
+                    self._signalled = token
+                    self.reload()
+
+                if self.interval > 0 and time.monotonic() - checked >= self.interval:
+                    checked = time.monotonic()
+                    current = self._signature()
+                    if current is not None and current != self._seen:
+                        time.sleep(min(self.interval, 1.0))
+                        if self._signature() == current:
+                            self._seen = current
+                            self.reload()
+                time.sleep(period)
+
+        self._watcher = threading.Thread(target=poll, name='data-watch', daemon=True)
+        self._watcher.start()
+
+    def status(self):
+        snap = snapshot
+        return {
+            'version': snap.version,
+            'loaded_at': snap.loaded_at,
+            'rows': snap.explorer.size,
+            'reloading': self.running,
+            'reloads': self.reloads,
+            'error': self.error,
+            'pid': os.getpid()
+        }
+
+reloader = DataReloader(DATA_PATH, DATA_WATCH_INTERVAL, RELOAD_SIGNAL_PATH if ADMIN_TOKEN else None)
+
+# Started on the first request of each process rather than at import, so a
+# gunicorn master that preloads the app doesn't poll for nothing and every
+# forked worker still gets its own watcher
+@server.before_request
+def ensure_watcher():
+    reloader.watch()
+
+@server.route('/admin/reload', methods=['GET', 'POST'])
+def reload_endpoint():
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.method == 'POST':
+        broadcast = reloader.signal()
+        started = reloader.reload()
+        return jsonify(dict(reloader.status(), started=started, broadcast=broadcast)), 202
+    return jsonify(reloader.status())
+
+# Heavy analyses (the market report) run as Dash background callbacks when
+# dash[diskcache] is installed: each job gets its own process, so long jobs
+# use other cores and never tie up a web worker, and they report progress and
+# can be cancelled. Results pass through a diskcache store in JOB_CACHE_DIR.
+# Without those packages, or when JOB_CACHE_DIR can't be written (e.g. a
+# read-only filesystem), the same callbacks run in the request as before.
+JOB_CACHE_DIR = os.environ.get('JOB_CACHE_DIR', os.path.join(DATA_CACHE_DIR, 'jobs'))
+
+try:
+    import diskcache
+    background_manager = dash.DiskcacheManager(diskcache.Cache(JOB_CACHE_DIR))
+except ImportError:
+    background_manager = None
+except (OSError, sqlite3.Error):
+    logger.warning('Job cache %s is not writable, running background jobs in the request', JOB_CACHE_DIR)
+    background_manager = None
+
+def heavy_callback(*args, progress=None, cancel=None, running=None, **kwargs):
+    if background_manager is None:
+        def decorator(func):
+            app.callback(*args, **kwargs)(functools.partial(func, None))
+            return func
+        return decorator
+    return app.callback(*args, background=True, manager=background_manager, interval=500,
+                        progress=progress, cancel=cancel, running=running, **kwargs)
+
+# Own-price elasticity and bootstrap interval of every product in every city,
+# evaluated at each product's reference price under the given policy
+def market_report(models, estimator='linear', policy='mean', set_progress=None):
+    ref = {'mean': models.price_mean, 'median': models.price_median, 'latest': models.price_latest}[policy]
+    rows = []
+    for c, city in enumerate(models.cities):
+        if set_progress is not None:
+            set_progress((str(c), str(len(models.cities))))
+        for i, (brand, container) in enumerate(models.products):
+            if np.isnan(models.own_coef[c, i]):
+                continue
+            price = float(ref[c, i])
+            elasticity, q_hat = models.own_elasticity(brand, container, price, city, estimator)
+            low, high = models.own_interval(brand, container, price, city, estimator) or (None, None)
+            rows.append({
+                'city': city, 'brand': brand, 'container': container,
+                'price': round(price, 2), 'quantity': round(q_hat), 'elasticity': round(elasticity, 3),
+                'low': None if low is None else round(low, 3), 'high': None if high is None else round(high, 3),
+                'demand': 'Elastic' if elasticity < -1 else 'Inelastic' if elasticity < 0 else 'Upward sloping'
+            })
+    return rows
+
+# App layout, built per page load from the current snapshot so new sessions
+# pick up reloaded data
+def serve_layout():
+    snap = snapshot
+    cities, brands, containers = snap.cities, snap.brands, snap.containers
+    city, (brand, container), (partner_brand, partner_container) = (
+        snap.default_city, snap.default_product, snap.default_partner)
+    return html.Div([
+        dcc.Store(id='price-ranges', data=snap.price_ranges),
+        dcc.Store(id='own-elasticity-store'),
+        dcc.Store(id='cross-elasticity-store'),
+        dcc.Store(id='own-live-price'),
+        dcc.Store(id='cross-live-price'),
+        dcc.Store(id='own-live-refresh'),
+        dcc.Store(id='cross-live-refresh'),
+
+        html.Div([
+            html.H1('Newberry College', style={'textAlign': 'center', 'color': 'crimson', 'fontSize': '48px', 'fontWeight': 'bold', 'marginBottom': '10px'}),
+            html.H1('Elasticity Analysis Tool', style={'textAlign': 'center', 'color': '#2c3e50'}),
+            html.P('Greek Soda Market Data Analysis', style={'textAlign': 'center', 'fontSize': '18px', 'color': '#7f8c8d'}),
+            html.Hr()
+        ]),
+
+        # Main content with two columns
         html.Div([
-            html.H3('Own-Price Elasticity Analysis', style={'color': '#3498db'}),
+            # Left column - Own Price Elasticity
+            html.Div([
+                html.H3('Own-Price Elasticity Analysis', style={'color': '#3498db'}),
+                html.Div([
+                    html.Label('Select City:', style={'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='own-city-dropdown',
+                        options=[{'label': c, 'value': c} for c in cities],
+                        value=city,
+                        style={'marginBottom': '10px'}
+                    ),
+
+                    html.Label('Select Brand:', style={'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='own-brand-dropdown',
+                        options=[{'label': b, 'value': b} for b in brands],
+                        value=brand,
+                        style={'marginBottom': '10px'}
+                    ),
+
+                    html.Label('Select Container:', style={'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='own-container-dropdown',
+                        options=[{'label': c, 'value': c} for c in containers],
+                        value=container,
+                        style={'marginBottom': '10px'}
+                    ),
+
+                    html.Label('Estimator:', style={'fontWeight': 'bold'}),
+                    dcc.RadioItems(
+                        id='own-estimator-radio',
+                        options=[{'label': label, 'value': e} for e, label in estimators.items()],
+                        value='linear',
+                        inline=True,
+                        style={'marginBottom': '10px'}
+                    ),
+
+                    html.Label('Price Point:', style={'fontWeight': 'bold'}),
+                    dcc.Slider(
+                        id='own-price-slider',
+                        min=0.5,
+                        max=5.0,
+                        value=2.0,
+                        step=0.1,
+                        marks={i: f'${i}' for i in range(1, 6)},
+                        tooltip={'placement': 'bottom', 'always_visible': True}
+                    ),
+
+                    dcc.Checklist(
+                        id='own-live-toggle',
+                        options=[{'label': ' Live update while dragging', 'value': 'live'}],
+                        value=[],
+                        style={'marginTop': '10px'}
+                    ),
+
+                    html.Br(),
+                    html.Button('Calculate Own-Price Elasticity',
+                               id='own-elasticity-button',
+                               style={'width': '100%', 'padding': '10px',
+                                     'backgroundColor': '#3498db', 'color': 'white',
+                                     'border': 'none', 'borderRadius': '5px',
+                                     'fontSize': '16px', 'cursor': 'pointer'}),
+
+                    html.Div(id='own-elasticity-output', style={'marginTop': '20px'}),
+                    html.Div(id='own-quiz-section', style={'marginTop': '20px'}),
+                    dcc.Graph(id='own-price-graph', style={'marginTop': '20px'})
+                ])
+            ], style={'width': '48%', 'display': 'inline-block', 'verticalAlign': 'top',
+                      'padding': '20px', 'backgroundColor': '#f8f9fa', 'borderRadius': '10px'}),
+
+            # Right column - Cross Price Elasticity
             html.Div([
-                html.Label('Select Brand:', style={'fontWeight': 'bold'}),
-                dcc.Dropdown(
-                    id='own-brand-dropdown',
-                    options=[{'label': b, 'value': b} for b in brands],
-                    value='adult-cola',
-                    style={'marginBottom': '10px'}
-                ),
-
-                html.Label('Select Container:', style={'fontWeight': 'bold'}),
-                dcc.Dropdown(
-                    id='own-container-dropdown',
-                    options=[{'label': c, 'value': c} for c in containers],
-                    value='plastic',
-                    style={'marginBottom': '10px'}
-                ),
-
-                html.Label('Price Point:', style={'fontWeight': 'bold'}),
-                dcc.Slider(
-                    id='own-price-slider',
-                    min=0.5,
-                    max=5.0,
-                    value=2.0,
-                    step=0.1,
-                    marks={i: f'${i}' for i in range(1, 6)},
-                    tooltip={'placement': 'bottom', 'always_visible': True}
-                ),
-
-                html.Br(),
-                html.Button('Calculate Own-Price Elasticity',
-                           id='own-elasticity-button',
-                           style={'width': '100%', 'padding': '10px',
-                                 'backgroundColor': '#3498db', 'color': 'white',
-                                 'border': 'none', 'borderRadius': '5px',
-                                 'fontSize': '16px', 'cursor': 'pointer'}),
-
-                html.Div(id='own-elasticity-output', style={'marginTop': '20px'}),
-                html.Div(id='own-quiz-section', style={'marginTop': '20px'}),
-                dcc.Graph(id='own-price-graph', style={'marginTop': '20px'})
-            ])
-        ], style={'width': '48%', 'display': 'inline-block', 'verticalAlign': 'top',
-                  'padding': '20px', 'backgroundColor': '#f8f9fa', 'borderRadius': '10px'}),
-
-        # Right column - Cross Price Elasticity
+                html.H3('Cross-Price Elasticity Analysis', style={'color': '#e74c3c'}),
+                html.Div([
+                    html.Label('Select City:', style={'fontWeight': 'bold', 'color': '#2c3e50'}),
+                    dcc.Dropdown(
+                        id='cross-city-dropdown',
+                        options=[{'label': c, 'value': c} for c in cities],
+                        value=city,
+                        style={'marginBottom': '15px'}
+                    ),
+
+                    html.Label('Product 1 (Demand):', style={'fontWeight': 'bold', 'color': '#2c3e50'}),
+                    dcc.Dropdown(
+                        id='cross-brand1-dropdown',
+                        options=[{'label': b, 'value': b} for b in brands],
+                        value=brand,
+                        style={'marginBottom': '5px'}
+                    ),
+                    dcc.Dropdown(
+                        id='cross-container1-dropdown',
+                        options=[{'label': c, 'value': c} for c in containers],
+                        value=container,
+                        style={'marginBottom': '15px'}
+                    ),
+
+                    html.Label('Product 2 (Price Change):', style={'fontWeight': 'bold', 'color': '#2c3e50'}),
+                    dcc.Dropdown(
+                        id='cross-brand2-dropdown',
+                        options=[{'label': b, 'value': b} for b in brands],
+                        value=partner_brand,
+                        style={'marginBottom': '5px'}
+                    ),
+                    dcc.Dropdown(
+                        id='cross-container2-dropdown',
+                        options=[{'label': c, 'value': c} for c in containers],
+                        value=partner_container,
+                        style={'marginBottom': '10px'}
+                    ),
+
+                    html.Label('Price Point for Product 2:', style={'fontWeight': 'bold'}),
+                    dcc.Slider(
+                        id='cross-price-slider',
+                        min=0.5,
+                        max=5.0,
+                        value=2.0,
+                        step=0.1,
+                        marks={i: f'${i}' for i in range(1, 6)},
+                        tooltip={'placement': 'bottom', 'always_visible': True}
+                    ),
+
+                    dcc.Checklist(
+                        id='cross-live-toggle',
+                        options=[{'label': ' Live update while dragging', 'value': 'live'}],
+                        value=[],
+                        style={'marginTop': '10px'}
+                    ),
+
+                    html.Br(),
+                    html.Button('Calculate Cross-Price Elasticity',
+                               id='cross-elasticity-button',
+                               style={'width': '100%', 'padding': '10px',
+                                     'backgroundColor': '#e74c3c', 'color': 'white',
+                                     'border': 'none', 'borderRadius': '5px',
+                                     'fontSize': '16px', 'cursor': 'pointer'}),
+
+                    html.Div(id='cross-elasticity-output', style={'marginTop': '20px'}),
+                    html.Div(id='cross-quiz-section', style={'marginTop': '20px'}),
+                    dcc.Graph(id='cross-price-graph', style={'marginTop': '20px'})
+                ])
+            ], style={'width': '48%', 'display': 'inline-block', 'verticalAlign': 'top',
+                      'padding': '20px', 'backgroundColor': '#f8f9fa', 'borderRadius': '10px',
+                      'marginLeft': '2%'})
+        ]),
+
+        # Market analysis section
         html.Div([
-            html.H3('Cross-Price Elasticity Analysis', style={'color': '#e74c3c'}),
+            html.H3('Market Analysis: Elasticity Matrix', style={'textAlign': 'center', 'color': '#2c3e50'}),
             html.Div([
-                html.Label('Product 1 (Demand):', style={'fontWeight': 'bold', 'color': '#2c3e50'}),
-                dcc.Dropdown(
-                    id='cross-brand1-dropdown',
-                    options=[{'label': b, 'value': b} for b in brands],
-                    value='adult-cola',
-                    style={'marginBottom': '5px'}
-                ),
-                dcc.Dropdown(
-                    id='cross-container1-dropdown',
-                    options=[{'label': c, 'value': c} for c in containers],
-                    value='plastic',
-                    style={'marginBottom': '15px'}
-                ),
-
-                html.Label('Product 2 (Price Change):', style={'fontWeight': 'bold', 'color': '#2c3e50'}),
-                dcc.Dropdown(
-                    id='cross-brand2-dropdown',
-                    options=[{'label': b, 'value': b} for b in brands],
-                    value='gazoza',
-                    style={'marginBottom': '5px'}
-                ),
-                dcc.Dropdown(
-                    id='cross-container2-dropdown',
-                    options=[{'label': c, 'value': c} for c in containers],
-                    value='plastic',
-                    style={'marginBottom': '10px'}
-                ),
-
-                html.Label('Price Point for Product 2:', style={'fontWeight': 'bold'}),
-                dcc.Slider(
-                    id='cross-price-slider',
-                    min=0.5,
-                    max=5.0,
-                    value=2.0,
-                    step=0.1,
-                    marks={i: f'${i}' for i in range(1, 6)},
-                    tooltip={'placement': 'bottom', 'always_visible': True}
-                ),
-
-                html.Br(),
-                html.Button('Calculate Cross-Price Elasticity',
-                           id='cross-elasticity-button',
-                           style={'width': '100%', 'padding': '10px',
-                                 'backgroundColor': '#e74c3c', 'color': 'white',
-                                 'border': 'none', 'borderRadius': '5px',
-                                 'fontSize': '16px', 'cursor': 'pointer'}),
-
-                html.Div(id='cross-elasticity-output', style={'marginTop': '20px'}),
-                html.Div(id='cross-quiz-section', style={'marginTop': '20px'}),
-                dcc.Graph(id='cross-price-graph', style={'marginTop': '20px'})
-            ])
-        ], style={'width': '48%', 'display': 'inline-block', 'verticalAlign': 'top',
-                  'padding': '20px', 'backgroundColor': '#f8f9fa', 'borderRadius': '10px',
-                  'marginLeft': '2%'})
-    ]),
-
-    # Data preview section
-    html.Div([
-        html.H3('Data Preview', style={'textAlign': 'center', 'color': '#2c3e50'}),
-        html.Div(id='data-preview', style={'overflowX': 'auto'})
-    ], style={'marginTop': '40px', 'padding': '20px', 'backgroundColor': '#f8f9fa',
-              'borderRadius': '10px'})
-], style={'padding': '20px', 'fontFamily': 'Arial, sans-serif', 'backgroundColor': '#ecf0f1'})
-
-# Callback to update own-price slider range
-@app.callback(
+                html.Div([
+                    html.Label('Select City:', style={'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='matrix-city-dropdown',
+                        options=[{'label': c, 'value': c} for c in cities],
+                        value=city
+                    )
+                ], style={'width': '30%', 'display': 'inline-block', 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label('Evaluate At:', style={'fontWeight': 'bold'}),
+                    dcc.RadioItems(
+                        id='matrix-policy-radio',
+                        options=[{'label': label, 'value': p} for p, label in price_policies.items()],
+                        value='mean',
+                        inline=True,
+                        style={'marginTop': '8px'}
+                    )
+                ], style={'width': '65%', 'display': 'inline-block', 'verticalAlign': 'top',
+                          'marginLeft': '5%'})
+            ]),
+            dcc.Graph(id='matrix-graph', style={'marginTop': '20px', 'height': '650px'})
+        ], style={'marginTop': '40px', 'padding': '20px', 'backgroundColor': '#f8f9fa',
+                  'borderRadius': '10px'}),
+
+        # Market report section
+        html.Div([
+            html.H3('Market Report: Every City and Product', style={'textAlign': 'center', 'color': '#2c3e50'}),
+            html.Div([
+                html.Div([
+                    html.Label('Estimator:', style={'fontWeight': 'bold'}),
+                    dcc.RadioItems(
+                        id='report-estimator-radio',
+                        options=[{'label': label, 'value': e} for e, label in estimators.items()],
+                        value='linear',
+                        inline=True,
+                        style={'marginTop': '8px'}
+                    )
+                ], style={'width': '45%', 'display': 'inline-block', 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label('Evaluate At:', style={'fontWeight': 'bold'}),
+                    dcc.RadioItems(
+                        id='report-policy-radio',
+                        options=[{'label': label, 'value': p} for p, label in price_policies.items()],
+                        value='mean',
+                        inline=True,
+                        style={'marginTop': '8px'}
+                    )
+                ], style={'width': '50%', 'display': 'inline-block', 'verticalAlign': 'top',
+                          'marginLeft': '5%'})
+            ]),
+            html.Div([
+                html.Button('Run Report', id='report-run-button',
+                            style={'padding': '10px 20px', 'backgroundColor': '#2c3e50', 'color': 'white',
+                                   'border': 'none', 'borderRadius': '5px', 'cursor': 'pointer'}),
+                html.Button('Cancel', id='report-cancel-button', disabled=True,
+                            style={'padding': '10px 20px', 'marginLeft': '10px', 'borderRadius': '5px'}),
+                html.Progress(id='report-progress', value='0', max='1',
+                              style={'marginLeft': '20px', 'width': '30%', 'verticalAlign': 'middle'})
+            ], style={'marginTop': '15px'}),
+            html.P(id='report-summary', style={'marginTop': '10px'}),
+            dash_table.DataTable(
+                id='report-table',
+                columns=[
+                    {'name': 'City', 'id': 'city'},
+                    {'name': 'Brand', 'id': 'brand'},
+                    {'name': 'Container', 'id': 'container'},
+                    {'name': 'Price', 'id': 'price', 'type': 'numeric'},
+                    {'name': 'Quantity', 'id': 'quantity', 'type': 'numeric'},
+                    {'name': 'Elasticity', 'id': 'elasticity', 'type': 'numeric'},
+                    {'name': '95% CI low', 'id': 'low', 'type': 'numeric'},
+                    {'name': '95% CI high', 'id': 'high', 'type': 'numeric'},
+                    {'name': 'Demand', 'id': 'demand'}
+                ],
+                data=[],
+                sort_action='native',
+                filter_action='native',
+                page_size=15,
+                style_table={'overflowX': 'auto'},
+                style_cell={'textAlign': 'center', 'fontFamily': 'Arial, sans-serif'}
+            )
+        ], style={'marginTop': '40px', 'padding': '20px', 'backgroundColor': '#f8f9fa',
+                  'borderRadius': '10px'}),
+
+        # Data explorer section
+        html.Div([
+            html.H3('Data Explorer', style={'textAlign': 'center', 'color': '#2c3e50'}),
+            html.P(id='data-preview-summary', style={'textAlign': 'center'}),
+            dash_table.DataTable(
+                id='data-preview',
+                columns=[{'name': col.title(), 'id': col,
+                          'type': 'numeric' if col in ('price', 'quantity') else
+                                  'datetime' if col == 'date' else 'text'}
+                         for col in snap.explorer.columns],
+                page_action='custom',
+                page_current=0,
+                page_size=15,
+                sort_action='custom',
+                sort_mode='single',
+                sort_by=[],
+                filter_action='custom',
+                filter_query='',
+                style_table={'overflowX': 'auto'},
+                style_cell={'textAlign': 'center', 'fontFamily': 'Arial, sans-serif'}
+            )
+        ], style={'marginTop': '40px', 'padding': '20px', 'backgroundColor': '#f8f9fa',
+                  'borderRadius': '10px'})
+    ], style={'padding': '20px', 'fontFamily': 'Arial, sans-serif', 'backgroundColor': '#ecf0f1'})
+
+app.layout = serve_layout
+
+# Elasticity readouts, shared by the full and live-update callbacks
+def own_result(elasticity, q_hat, price_point, interval=None, revenue=None, optimum=None):
+    lines = [
+        html.H4(f'Own-Price Elasticity: {elasticity:.3f}'),
+        html.P(f'At price ${price_point:.2f}, estimated quantity: {q_hat:.0f}')
+    ]
+    if interval is not None:
+        lines.append(html.P(f'95% bootstrap interval: [{interval[0]:.3f}, {interval[1]:.3f}] '
+                            f'({BOOTSTRAP_REPLICATES:,} resamples)'))
+    if revenue is not None:
+        lines.append(html.P(f'Estimated revenue: ${revenue:,.0f}'))
+    if optimum is not None:
+        price, _, best, interior = optimum
+        note = '' if interior else ' (at the end of the slider range, so revenue would keep rising beyond it)'
+        lines.append(html.P(f'Optimal price: ${price:.2f}, maximizing estimated revenue at ${best:,.0f}{note}'))
+    return html.Div(lines)
+
+def cross_result(elasticity, brand1, brand2, price_point):
+    return html.Div([
+        html.H4(f'Cross-Price Elasticity: {elasticity:.3f}'),
+        html.P(f'{brand2} price effect on {brand1} demand at ${price_point:.2f}')
+    ])
+
+# Slider ranges are set in the browser from the price-ranges store
+app.clientside_callback(
+    ClientsideFunction(namespace='elasticity', function_name='updatePriceSlider'),
     [Output('own-price-slider', 'min'),
      Output('own-price-slider', 'max'),
      Output('own-price-slider', 'value'),
      Output('own-price-slider', 'marks')],
     [Input('own-brand-dropdown', 'value'),
-     Input('own-container-dropdown', 'value')]
+     Input('own-container-dropdown', 'value'),
+     Input('own-city-dropdown', 'value'),
+     Input('price-ranges', 'data')]
 )
-def update_own_price_slider(brand, container):
-    min_price, max_price = get_price_range(brand, container)
-    # Add some padding to the range
-    min_price = min_price * 0.8
-    max_price = max_price * 1.2
-    value = (min_price + max_price) / 2
-
-    # Create marks at reasonable intervals
-    step = (max_price - min_price) / 4
-    marks = {round(min_price + i * step, 2): f'${round(min_price + i * step, 2):.2f}'
-             for i in range(5)}
-
-    return min_price, max_price, value, marks
 
-# Callback to update cross-price slider range
-@app.callback(
+app.clientside_callback(
+    ClientsideFunction(namespace='elasticity', function_name='updatePriceSlider'),
     [Output('cross-price-slider', 'min'),
      Output('cross-price-slider', 'max'),
      Output('cross-price-slider', 'value'),
      Output('cross-price-slider', 'marks')],
     [Input('cross-brand2-dropdown', 'value'),
-     Input('cross-container2-dropdown', 'value')]
+     Input('cross-container2-dropdown', 'value'),
+     Input('cross-city-dropdown', 'value'),
+     Input('price-ranges', 'data')]
 )
-def update_cross_price_slider(brand, container):
-    min_price, max_price = get_price_range(brand, container)
-    # Add some padding to the range
-    min_price = min_price * 0.8
-    max_price = max_price * 1.2
-    value = (min_price + max_price) / 2
-
-    # Create marks at reasonable intervals
-    step = (max_price - min_price) / 4
-    marks = {round(min_price + i * step, 2): f'${round(min_price + i * step, 2):.2f}'
-             for i in range(5)}
-
-    return min_price, max_price, value, marks
 
 # Callback for own-price elasticity
 @app.callback(
     [Output('own-elasticity-output', 'children'),
      Output('own-price-graph', 'figure'),
-     Output('own-quiz-section', 'children')],
+     Output('own-quiz-section', 'children'),
+     Output('own-elasticity-store', 'data')],
     [Input('own-elasticity-button', 'n_clicks')],
     [State('own-brand-dropdown', 'value'),
      State('own-container-dropdown', 'value'),
-     State('own-price-slider', 'value')]
+     State('own-price-slider', 'value'),
+     State('own-city-dropdown', 'value'),
+     State('own-estimator-radio', 'value')]
 )
-def calculate_own_price_elasticity(n_clicks, brand, container, price_point):
+@metrics.instrument('own_elasticity')
+def calculate_own_price_elasticity(n_clicks, brand, container, price_point, city, estimator='linear'):
+    snap = snapshot
     if n_clicks is None:
-        return '', go.Figure()
+        return '', figure_dict(), '', None
 
     try:
-        Qx = df_city['mean_q']['Athens'][brand][container].values.reshape(-1,1)
-        Px = df_city['mean_p']['Athens'][brand][container].values.reshape(-1,1)
-
-        # Calculate regression
-        reg = LinearRegression().fit(Px, Qx)
-        Px_plot = np.linspace(Px.min(), Px.max(), 100).reshape(-1,1)
-        Qx_pred = reg.predict(Px_plot)
-
-        # Calculate elasticity
-        Q_hat = reg.predict(np.array(price_point).reshape(-1, 1))
-        elasticity = reg.coef_[0][0] * (price_point / Q_hat[0][0])
-
-        # Create plot
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=Qx.flatten(), y=Px.flatten(),
-                                 mode='markers', name='Data',
-                                 marker=dict(size=10, color='blue', opacity=0.7)))
-        fig.add_trace(go.Scatter(x=Qx_pred.flatten(), y=Px_plot.flatten(),
-                                 mode='lines', name='Regression Line',
-                                 line=dict(color='red', width=2)))
-        fig.add_trace(go.Scatter(x=[Q_hat[0][0]], y=[price_point],
-                                 mode='markers', name='Analysis Point',
-                                 marker=dict(size=15, color='green', symbol='star')))
-
-        fig.update_layout(
-            title=f'Price vs Quantity: {brand} {container}',
-            xaxis_title=f'Quantity',
-            yaxis_title=f'Price ($)',
-            showlegend=True,
-            hovermode='closest'
-        )
-
-        result = html.Div([
-            html.H4(f'Own-Price Elasticity: {elasticity:.3f}'),
-            html.P(f'At price ${price_point:.2f}, estimated quantity: {Q_hat[0][0]:.0f}')
-        ])
+        price_point = quantize_price(price_point)
+        key = ('own', snap.version, city, brand, container, price_point, estimator)
+        with metrics.stage('cache'):
+            cached = response_cache.get(key)
+        if cached is None:
+            with metrics.stage('lookup'):
+                Qx = snap.series.quantity(brand, container, city)
+                Px = snap.series.price(brand, container, city)
+
+            # Look up the precomputed regression
+            with metrics.stage('fit'):
+                Px_plot, Qx_pred = snap.models.own_line(brand, container, city, estimator=estimator)
+
+            # Read elasticity, quantity and revenue off the price-response table
+            with metrics.stage('predict'):
+                elasticity, Q_hat, revenue = snap.models.own_response(brand, container, price_point, city,
+                                                                      estimator)
+                optimum = snap.models.own_optimum(brand, container, city, estimator)
+
+            # Bootstrap confidence interval
+            with metrics.stage('bootstrap'):
+                interval = snap.models.own_interval(brand, container, price_point, city, estimator)
+
+            # Create plot
+            with metrics.stage('figure'):
+                fig = figure_dict(
+                    [scatter_trace(Qx, Px, 'Data',
+                                   marker=dict(size=10, color='blue', opacity=0.7)),
+                     scatter_trace(Qx_pred, Px_plot, f'Regression Line ({estimators[estimator]})',
+                                   mode='lines', line=dict(color='red', width=2)),
+                     scatter_trace([Q_hat], [price_point], 'Analysis Point',
+                                   marker=dict(size=15, color='green', symbol='star')),
+                     scatter_trace([optimum[1]], [optimum[0]], 'Optimal Price',
+                                   marker=dict(size=13, color='orange', symbol='diamond'))],
+                    title=f'Price vs Quantity: {brand} {container} ({city})',
+                    xaxis_title=f'Quantity',
+                    yaxis_title=f'Price ($)',
+                    showlegend=True,
+                    hovermode='closest'
+                )
+
+            cached = {'elasticity': elasticity, 'q_hat': Q_hat, 'interval': interval, 'revenue': revenue,
+                      'optimum': optimum, 'figure': fig}
+            with metrics.stage('cache'):
+                response_cache.set(key, cached)
+        elasticity, Q_hat, fig = cached['elasticity'], cached['q_hat'], cached['figure']
+
+        result = own_result(elasticity, Q_hat, price_point, cached.get('interval'), cached.get('revenue'),
+                            cached.get('optimum'))
 
         quiz_section = html.Div([
             html.H5('Quiz: What type of demand is this?', style={'marginTop': '20px'}),
@@ -275,69 +1726,75 @@ def calculate_own_price_elasticity(n_clicks, brand, container, price_point):
             html.Div(id='own-quiz-feedback', style={'marginTop': '10px'})
         ], style={'backgroundColor': '#f0f8ff', 'padding': '15px', 'borderRadius': '5px'})
 
-        return result, fig, quiz_section
+        return result, fig, quiz_section, {'elasticity': elasticity}
 
     except Exception as e:
+        metrics.error()
         error_msg = html.Div([
             html.P(f'Error: {str(e)}', style={'color': 'red'})
         ])
-        return error_msg, go.Figure(), html.Div()
+        return error_msg, figure_dict(), html.Div(), None
 
 # Callback for cross-price elasticity
 @app.callback(
     [Output('cross-elasticity-output', 'children'),
      Output('cross-price-graph', 'figure'),
-     Output('cross-quiz-section', 'children')],
+     Output('cross-quiz-section', 'children'),
+     Output('cross-elasticity-store', 'data')],
     [Input('cross-elasticity-button', 'n_clicks')],
     [State('cross-brand1-dropdown', 'value'),
      State('cross-container1-dropdown', 'value'),
      State('cross-brand2-dropdown', 'value'),
      State('cross-container2-dropdown', 'value'),
-     State('cross-price-slider', 'value')]
+     State('cross-price-slider', 'value'),
+     State('cross-city-dropdown', 'value')]
 )
-def calculate_cross_price_elasticity(n_clicks, brand1, container1, brand2, container2, price_point):
+@metrics.instrument('cross_elasticity')
+def calculate_cross_price_elasticity(n_clicks, brand1, container1, brand2, container2, price_point, city):
+    snap = snapshot
     if n_clicks is None:
-        return '', go.Figure()
+        return '', figure_dict(), '', None
 
     try:
-        Qx = df_city['mean_q']['Athens'][brand1][container1].values.reshape(-1,1)
-        Px1 = df_city['mean_p']['Athens'][brand1][container1].values.reshape(-1,1)
-        Px2 = df_city['mean_p']['Athens'][brand2][container2].values.reshape(-1,1)
-        Px = np.concatenate((Px1, Px2), axis=1)
-
-        reg = LinearRegression().fit(Px, Qx)
-        mPx1 = np.mean(Px1)
-        P = np.array([[mPx1, price_point]])
-        Q_hat = reg.predict(P)
-        cross_elasticity = reg.coef_[0][1] * (price_point / Q_hat[0][0])
-
-        # Create visualization
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=Px2.flatten(), y=Qx.flatten(),
-                                 mode='markers', name=f'{brand1} Quantity vs {brand2} Price',
-                                 marker=dict(size=10, color='purple', opacity=0.7)))
-
-        # Add regression line
-        Px2_plot = np.linspace(Px2.min(), Px2.max(), 100).reshape(-1,1)
-        Px_pred = np.column_stack([np.full(100, mPx1), Px2_plot])
-        Qx_pred = reg.predict(Px_pred)
-
-        fig.add_trace(go.Scatter(x=Px2_plot.flatten(), y=Qx_pred.flatten(),
-                                 mode='lines', name='Regression Line',
-                                 line=dict(color='orange', width=2)))
-
-        fig.update_layout(
-            title=f'Cross-Price Relationship: {brand2} Price Effect on {brand1} Demand',
-            xaxis_title=f'{brand2} Price ($)',
-            yaxis_title=f'{brand1} Quantity',
-            showlegend=True,
-            hovermode='closest'
-        )
-
-        result = html.Div([
-            html.H4(f'Cross-Price Elasticity: {cross_elasticity:.3f}'),
-            html.P(f'{brand2} price effect on {brand1} demand at ${price_point:.2f}')
-        ])
+        price_point = quantize_price(price_point)
+        key = ('cross', snap.version, city, brand1, container1, brand2, container2, price_point)
+        with metrics.stage('cache'):
+            cached = response_cache.get(key)
+        if cached is None:
+            with metrics.stage('lookup'):
+                Qx = snap.series.quantity(brand1, container1, city)
+                Px2 = snap.series.price(brand2, container2, city)
+
+            with metrics.stage('predict'):
+                cross_elasticity, Q_hat = snap.models.cross_elasticity(brand1, container1, brand2, container2,
+                                                                  price_point, city)
+
+            # Regression line from the precomputed model
+            with metrics.stage('fit'):
+                Px2_plot, Qx_pred = snap.models.cross_line(brand1, container1, brand2, container2, city)
+
+            # Create visualization
+            with metrics.stage('figure'):
+                fig = figure_dict(
+                    [scatter_trace(Px2, Qx, f'{brand1} Quantity vs {brand2} Price',
+                                   marker=dict(size=10, color='purple', opacity=0.7)),
+                     scatter_trace(Px2_plot, Qx_pred, 'Regression Line', mode='lines',
+                                   line=dict(color='orange', width=2)),
+                     scatter_trace([price_point], [Q_hat], 'Analysis Point',
+                                   marker=dict(size=15, color='green', symbol='star'))],
+                    title=f'Cross-Price Relationship: {brand2} Price Effect on {brand1} Demand ({city})',
+                    xaxis_title=f'{brand2} Price ($)',
+                    yaxis_title=f'{brand1} Quantity',
+                    showlegend=True,
+                    hovermode='closest'
+                )
+
+            cached = {'elasticity': cross_elasticity, 'q_hat': Q_hat, 'figure': fig}
+            with metrics.stage('cache'):
+                response_cache.set(key, cached)
+        cross_elasticity, fig = cached['elasticity'], cached['figure']
+
+        result = cross_result(cross_elasticity, brand1, brand2, price_point)
 
         cross_quiz_section = html.Div([
             html.H5('Quiz: What is the relationship between these products?', style={'marginTop': '20px'}),
@@ -357,126 +1814,262 @@ def calculate_cross_price_elasticity(n_clicks, brand1, container1, brand2, conta
             html.Div(id='cross-quiz-feedback', style={'marginTop': '10px'})
         ], style={'backgroundColor': '#f0f8ff', 'padding': '15px', 'borderRadius': '5px'})
 
-        return result, fig, cross_quiz_section
+        return result, fig, cross_quiz_section, {'elasticity': cross_elasticity}
 
     except Exception as e:
+        metrics.error()
         error_msg = html.Div([
             html.P(f'Error: {str(e)}', style={'color': 'red'})
         ])
-        return error_msg, go.Figure(), html.Div()
+        return error_msg, figure_dict(), html.Div(), None
 
-# Quiz callback for own-price elasticity
-@app.callback(
+# Quiz answers are graded in the browser against the elasticity stored by
+# the compute callbacks
+app.clientside_callback(
+    ClientsideFunction(namespace='elasticity', function_name='gradeOwnQuiz'),
     Output('own-quiz-feedback', 'children'),
     [Input('own-quiz-submit', 'n_clicks')],
     [State('own-elasticity-quiz', 'value'),
-     State('own-brand-dropdown', 'value'),
-     State('own-container-dropdown', 'value'),
-     State('own-price-slider', 'value')]
+     State('own-elasticity-store', 'data')]
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='elasticity', function_name='gradeCrossQuiz'),
+    Output('cross-quiz-feedback', 'children'),
+    [Input('cross-quiz-submit', 'n_clicks')],
+    [State('cross-elasticity-quiz', 'value'),
+     State('cross-elasticity-store', 'data')]
+)
+
+# Live mode. While the slider is dragged, its debounced position arrives in the
+# *-live-price stores and only the analysis point (trace 2) and the readout
+# are patched; the data scatter and regression line are sent again only when
+# the product or city changes. Both checks run in the browser, which writes
+# the compute callback's arguments to the *-live-refresh stores when a full
+# refresh is due, so with live mode off no request reaches the server.
+app.clientside_callback(
+    ClientsideFunction(namespace='elasticity', function_name='debounceOwnPrice'),
+    Output('own-live-price', 'data'),
+    [Input('own-price-slider', 'drag_value')],
+    [State('own-live-toggle', 'value')],
+    prevent_initial_call=True
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='elasticity', function_name='debounceCrossPrice'),
+    Output('cross-live-price', 'data'),
+    [Input('cross-price-slider', 'drag_value')],
+    [State('cross-live-toggle', 'value')],
+    prevent_initial_call=True
 )
-def check_own_elasticity_quiz(n_clicks, user_answer, brand, container, price_point):
-    if n_clicks is None or user_answer is None:
-        return ''
 
+app.clientside_callback(
+    ClientsideFunction(namespace='elasticity', function_name='forwardOwnRefresh'),
+    Output('own-live-refresh', 'data'),
+    [Input('own-live-toggle', 'value'),
+     Input('own-brand-dropdown', 'value'),
+     Input('own-container-dropdown', 'value'),
+     Input('own-price-slider', 'value'),
+     Input('own-city-dropdown', 'value'),
+     Input('own-estimator-radio', 'value')],
+    prevent_initial_call=True
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='elasticity', function_name='forwardCrossRefresh'),
+    Output('cross-live-refresh', 'data'),
+    [Input('cross-live-toggle', 'value'),
+     Input('cross-brand1-dropdown', 'value'),
+     Input('cross-container1-dropdown', 'value'),
+     Input('cross-brand2-dropdown', 'value'),
+     Input('cross-container2-dropdown', 'value'),
+     Input('cross-price-slider', 'value'),
+     Input('cross-city-dropdown', 'value')],
+    prevent_initial_call=True
+)
+
+@app.callback(
+    [Output('own-elasticity-output', 'children', allow_duplicate=True),
+     Output('own-price-graph', 'figure', allow_duplicate=True),
+     Output('own-quiz-section', 'children', allow_duplicate=True),
+     Output('own-elasticity-store', 'data', allow_duplicate=True)],
+    [Input('own-live-refresh', 'data')],
+    prevent_initial_call=True
+)
+@metrics.instrument('own_live_refresh')
+def refresh_own_live_figure(refresh):
+    if not refresh:
+        raise PreventUpdate
+    return calculate_own_price_elasticity(1, *refresh)
+
+@app.callback(
+    [Output('own-price-graph', 'figure', allow_duplicate=True),
+     Output('own-elasticity-output', 'children', allow_duplicate=True),
+     Output('own-elasticity-store', 'data', allow_duplicate=True)],
+    [Input('own-live-price', 'data')],
+    [State('own-brand-dropdown', 'value'),
+     State('own-container-dropdown', 'value'),
+     State('own-city-dropdown', 'value'),
+     State('own-estimator-radio', 'value')],
+    prevent_initial_call=True
+)
+@metrics.instrument('own_live_point')
+def update_own_live_point(live_price, brand, container, city, estimator='linear'):
+    snap = snapshot
     try:
-        Qx = df_city['mean_q']['Athens'][brand][container].values.reshape(-1,1)
-        Px = df_city['mean_p']['Athens'][brand][container].values.reshape(-1,1)
-        reg = LinearRegression().fit(Px, Qx)
-        Q_hat = reg.predict(np.array(price_point).reshape(-1, 1))
-        elasticity = reg.coef_[0][0] * (price_point / Q_hat[0][0])
-
-        if elasticity < -1:
-            correct_answer = 'elastic'
-            explanation = 'Demand is ELASTIC (responsive to price changes)'
-        elif elasticity > -1 and elasticity < 0:
-            correct_answer = 'inelastic'
-            explanation = 'Demand is INELASTIC (less responsive to price changes)'
-        else:
-            correct_answer = 'unit'
-            explanation = 'Demand is UNIT ELASTIC (proportional response)'
-
-        if user_answer == correct_answer:
-            return html.Div([
-                html.P('✓ Correct!', style={'color': 'green', 'fontWeight': 'bold', 'fontSize': '18px'}),
-                html.P(explanation, style={'color': 'green'})
-            ])
-        else:
-            return html.Div([
-                html.P('✗ Incorrect', style={'color': 'red', 'fontWeight': 'bold', 'fontSize': '18px'}),
-                html.P(f'The correct answer is: {explanation}', style={'color': 'red'})
-            ])
+        price_point = quantize_price(live_price['price'])
+        elasticity, Q_hat, revenue = snap.models.own_response(brand, container, price_point, city, estimator)
+        optimum = snap.models.own_optimum(brand, container, city, estimator)
+        interval = snap.models.own_interval(brand, container, price_point, city, estimator)
+    except (KeyError, TypeError):
+        raise PreventUpdate
 
-    except Exception:
-        return html.P('Error calculating quiz result', style={'color': 'red'})
+    fig = Patch()
+    fig['data'][2]['x'] = [Q_hat]
+    fig['data'][2]['y'] = [price_point]
+    return (fig, own_result(elasticity, Q_hat, price_point, interval, revenue, optimum),
+            {'elasticity': elasticity})
 
-# Quiz callback for cross-price elasticity
 @app.callback(
-    Output('cross-quiz-feedback', 'children'),
-    [Input('cross-quiz-submit', 'n_clicks')],
-    [State('cross-elasticity-quiz', 'value'),
-     State('cross-brand1-dropdown', 'value'),
+    [Output('cross-elasticity-output', 'children', allow_duplicate=True),
+     Output('cross-price-graph', 'figure', allow_duplicate=True),
+     Output('cross-quiz-section', 'children', allow_duplicate=True),
+     Output('cross-elasticity-store', 'data', allow_duplicate=True)],
+    [Input('cross-live-refresh', 'data')],
+    prevent_initial_call=True
+)
+@metrics.instrument('cross_live_refresh')
+def refresh_cross_live_figure(refresh):
+    if not refresh:
+        raise PreventUpdate
+    return calculate_cross_price_elasticity(1, *refresh)
+
+@app.callback(
+    [Output('cross-price-graph', 'figure', allow_duplicate=True),
+     Output('cross-elasticity-output', 'children', allow_duplicate=True),
+     Output('cross-elasticity-store', 'data', allow_duplicate=True)],
+    [Input('cross-live-price', 'data')],
+    [State('cross-brand1-dropdown', 'value'),
      State('cross-container1-dropdown', 'value'),
      State('cross-brand2-dropdown', 'value'),
      State('cross-container2-dropdown', 'value'),
-     State('cross-price-slider', 'value')]
+     State('cross-city-dropdown', 'value')],
+    prevent_initial_call=True
 )
-def check_cross_elasticity_quiz(n_clicks, user_answer, brand1, container1, brand2, container2, price_point):
-    if n_clicks is None or user_answer is None:
-        return ''
+@metrics.instrument('cross_live_point')
+def update_cross_live_point(live_price, brand1, container1, brand2, container2, city):
+    snap = snapshot
+    try:
+        price_point = quantize_price(live_price['price'])
+        cross_elasticity, Q_hat = snap.models.cross_elasticity(brand1, container1, brand2, container2,
+                                                          price_point, city)
+    except (KeyError, TypeError):
+        raise PreventUpdate
 
+    fig = Patch()
+    fig['data'][2]['x'] = [price_point]
+    fig['data'][2]['y'] = [Q_hat]
+    return (fig, cross_result(cross_elasticity, brand1, brand2, price_point),
+            {'elasticity': cross_elasticity})
+
+# JSON view of the elasticity matrix, e.g. /api/elasticity-matrix?city=Athens&policy=mean;
+# city defaults to the one the page opens on
+@server.route('/api/elasticity-matrix')
+def elasticity_matrix_api():
+    snap = snapshot
+    city = request.args.get('city', snap.default_city)
+    policy = request.args.get('policy', 'mean')
+    if city not in snap.models.city_codes or policy not in price_policies:
+        return jsonify({'error': f'Unknown city or policy: {city}, {policy}'}), 400
+
+    matrix = snap.models.elasticity_matrix(city, policy)
+    return jsonify({
+        'city': city,
+        'policy': policy,
+        'products': [f'{b} {c}' for b, c in snap.models.products],
+        'matrix': [[None if np.isnan(v) else float(v) for v in row] for row in matrix]
+    })
+
+# Callback for the elasticity matrix heatmap
+@app.callback(
+    Output('matrix-graph', 'figure'),
+    [Input('matrix-city-dropdown', 'value'),
+     Input('matrix-policy-radio', 'value')]
+)
+@metrics.instrument('elasticity_matrix')
+def update_elasticity_matrix(city, policy):
+    snap = snapshot
     try:
-        Qx = df_city['mean_q']['Athens'][brand1][container1].values.reshape(-1,1)
-        Px1 = df_city['mean_p']['Athens'][brand1][container1].values.reshape(-1,1)
-        Px2 = df_city['mean_p']['Athens'][brand2][container2].values.reshape(-1,1)
-        Px = np.concatenate((Px1, Px2), axis=1)
-        reg = LinearRegression().fit(Px, Qx)
-        mPx1 = np.mean(Px1)
-        P = np.array([[mPx1, price_point]])
-        Q_hat = reg.predict(P)
-        cross_elasticity = reg.coef_[0][1] * (price_point / Q_hat[0][0])
-
-        if cross_elasticity > 0.1:
-            correct_answer = 'substitutes'
-            explanation = 'Products are SUBSTITUTES (competing products)'
-        elif cross_elasticity < -0.1:
-            correct_answer = 'complements'
-            explanation = 'Products are COMPLEMENTS (used together)'
-        else:
-            correct_answer = 'independent'
-            explanation = 'Products are relatively INDEPENDENT (no relationship)'
-
-        if user_answer == correct_answer:
-            return html.Div([
-                html.P('✓ Correct!', style={'color': 'green', 'fontWeight': 'bold', 'fontSize': '18px'}),
-                html.P(explanation, style={'color': 'green'})
-            ])
-        else:
-            return html.Div([
-                html.P('✗ Incorrect', style={'color': 'red', 'fontWeight': 'bold', 'fontSize': '18px'}),
-                html.P(f'The correct answer is: {explanation}', style={'color': 'red'})
-            ])
+        matrix = snap.models.elasticity_matrix(city, policy)
+    except KeyError:
+        return figure_dict()
 
-    except Exception:
-        return html.P('Error calculating quiz result', style={'color': 'red'})
+    labels = [f'{b} {c}' for b, c in snap.models.products]
+    heatmap = {
+        'type': 'heatmap',
+        'z': [encode_array(row) for row in matrix], 'x': labels, 'y': labels,
+        'colorscale': 'RdBu', 'zmid': 0,
+        'texttemplate': '%{z:.2f}',
+        'hovertemplate': 'Demand: %{y}<br>Price: %{x}<br>Elasticity: %{z:.3f}<extra></extra>'
+    }
+    return figure_dict(
+        [heatmap],
+        title=f'Own- and Cross-Price Elasticities ({city}, {price_policies[policy].lower()})',
+        xaxis_title='Price of',
+        yaxis_title='Demand for',
+        yaxis={'autorange': 'reversed'}
+    )
 
-# Callback for data preview
+# Callback for the market report, run as a background job where available
+@heavy_callback(
+    [Output('report-table', 'data'),
+     Output('report-summary', 'children')],
+    [Input('report-run-button', 'n_clicks')],
+    [State('report-estimator-radio', 'value'),
+     State('report-policy-radio', 'value')],
+    progress=[Output('report-progress', 'value'),
+              Output('report-progress', 'max')],
+    cancel=[Input('report-cancel-button', 'n_clicks')],
+    running=[(Output('report-run-button', 'disabled'), True, False),
+             (Output('report-cancel-button', 'disabled'), False, True)],
+    prevent_initial_call=True
+)
+def run_market_report(set_progress, n_clicks, estimator, policy):
+    snap = snapshot
+    start = time.perf_counter()
+    rows = market_report(snap.models, estimator, policy, set_progress)
+    return rows, (f'{len(rows)} products in {len(snap.models.cities)} cities, '
+                  f'{BOOTSTRAP_REPLICATES:,} bootstrap resamples each ({time.perf_counter() - start:.1f}s)')
+
+# Callback for the data explorer: one page of the filtered, sorted rows per
+# request. A new filter or sort goes back to the first page.
 @app.callback(
-    Output('data-preview', 'children'),
-    [Input('own-brand-dropdown', 'value')]  # Triggers on page load
+    [Output('data-preview', 'data'),
+     Output('data-preview', 'page_current'),
+     Output('data-preview', 'page_count'),
+     Output('data-preview-summary', 'children')],
+    [Input('data-preview', 'page_current'),
+     Input('data-preview', 'page_size'),
+     Input('data-preview', 'sort_by'),
+     Input('data-preview', 'filter_query')]
 )
-def update_data_preview(brand):
-    sample_data = df[['date', 'brand', 'container', 'price', 'quantity']].head(10)
+@metrics.instrument('data_explorer')
+def update_data_preview(page_current, page_size, sort_by, filter_query):
+    snap = snapshot
+    if ctx.triggered_id == 'data-preview' and 'data-preview.page_current' not in ctx.triggered_prop_ids:
+        page_current = 0
+    records, page_current, page_count, matches = snap.explorer.page(page_current, page_size, filter_query, sort_by)
+    return records, page_current, page_count, f'{matches:,} of {snap.explorer.size:,} rows'
 
-    return html.Table([
-        html.Thead([
-            html.Tr([html.Th(col) for col in sample_data.columns])
-        ]),
-        html.Tbody([
-            html.Tr([
-                html.Td(sample_data.iloc[i][col]) for col in sample_data.columns
-            ]) for i in range(len(sample_data))
-        ])
-    ], style={'width': '100%', 'textAlign': 'center'})
+# App factory for gunicorn (see gunicorn.conf.py). The dataset is loaded when
+# this module is imported, which with preload_app happens once in the master;
+# forked workers share the snapshot's arrays copy-on-write and the
+# memory-mapped cache files through the page cache. Freezing the collector
+# keeps it from writing to (and so copying) the master's objects in workers.
+def create_app():
+    gc.collect()
+    gc.freeze()
+    return server
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8050))
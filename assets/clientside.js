@@ -0,0 +1,129 @@
+// Clientside callbacks: slider ranges and quiz grading only need data the
+// browser already has, so they run here instead of costing a server round trip.
+(function() {
+    // Quiet period before a dragged slider position is sent to the server
+    var LIVE_DEBOUNCE_MS = 150;
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        elasticity: {
+            // Pad the product's observed price range by 20% on each side and put
+            // five marks across it, defaulting to $0.50-$5.00 for unknown products
+            updatePriceSlider: function(brand, container, city, ranges) {
+                var range = ((((ranges || {})[city] || {})[brand] || {})[container]) || [0.5, 5.0];
+                var minPrice = range[0] * 0.8;
+                var maxPrice = range[1] * 1.2;
+                var value = (minPrice + maxPrice) / 2;
+
+                var step = (maxPrice - minPrice) / 4;
+                var marks = {};
+                for (var i = 0; i < 5; i++) {
+                    var mark = Math.round((minPrice + i * step) * 100) / 100;
+                    marks[mark] = '$' + mark.toFixed(2);
+                }
+                return [minPrice, maxPrice, value, marks];
+            },
+
+            gradeOwnQuiz: function(nClicks, answer, result) {
+                if (!nClicks || !answer) {
+                    return '';
+                }
+                if (!result) {
+                    return errorFeedback();
+                }
+
+                var e = result.elasticity;
+                if (e < -1) {
+                    return feedback(answer === 'elastic',
+                                    'Demand is ELASTIC (responsive to price changes)');
+                } else if (e > -1 && e < 0) {
+                    return feedback(answer === 'inelastic',
+                                    'Demand is INELASTIC (less responsive to price changes)');
+                }
+                return feedback(answer === 'unit', 'Demand is UNIT ELASTIC (proportional response)');
+            },
+
+            gradeCrossQuiz: function(nClicks, answer, result) {
+                if (!nClicks || !answer) {
+                    return '';
+                }
+                if (!result) {
+                    return errorFeedback();
+                }
+
+                var e = result.elasticity;
+                if (e > 0.1) {
+                    return feedback(answer === 'substitutes',
+                                    'Products are SUBSTITUTES (competing products)');
+                } else if (e < -0.1) {
+                    return feedback(answer === 'complements',
+                                    'Products are COMPLEMENTS (used together)');
+                }
+                return feedback(answer === 'independent',
+                                'Products are relatively INDEPENDENT (no relationship)');
+            },
+
+            debounceOwnPrice: debounced(),
+            debounceCrossPrice: debounced(),
+
+            forwardOwnRefresh: liveRefresh('own-price-slider'),
+            forwardCrossRefresh: liveRefresh('cross-price-slider')
+        }
+    });
+
+    // Live mode: pass the panel's inputs on to its *-live-refresh store, and so
+    // to the server's full refresh, only when live mode is on and something
+    // other than the slider changed. Slider moves arrive through the debounced
+    // drag position, and with live mode off nothing leaves the browser.
+    function liveRefresh(slider) {
+        return function(liveMode) {
+            var dc = window.dash_clientside;
+            var others = (dc.callback_context.triggered || []).filter(function(t) {
+                return t.prop_id !== slider + '.value';
+            });
+            if (!liveMode || liveMode.indexOf('live') === -1 || others.length === 0) {
+                return dc.no_update;
+            }
+            return Array.prototype.slice.call(arguments, 1);
+        };
+    }
+
+    // Live mode: resolve with the slider position once dragging pauses; any
+    // position superseded within the quiet period resolves to no_update
+    function debounced() {
+        var latest = 0;
+        return function(dragValue, liveMode) {
+            var dc = window.dash_clientside;
+            if (!liveMode || liveMode.indexOf('live') === -1 || dragValue == null) {
+                return dc.no_update;
+            }
+            var call = ++latest;
+            return new Promise(function(resolve) {
+                setTimeout(function() {
+                    resolve(call === latest ? {price: dragValue} : dc.no_update);
+                }, LIVE_DEBOUNCE_MS);
+            });
+        };
+    }
+
+    function paragraph(text, style) {
+        return {type: 'P', namespace: 'dash_html_components', props: {children: text, style: style}};
+    }
+
+    function feedback(correct, explanation) {
+        var color = correct ? 'green' : 'red';
+        return {
+            type: 'Div',
+            namespace: 'dash_html_components',
+            props: {children: [
+                paragraph(correct ? '✓ Correct!' : '✗ Incorrect',
+                          {color: color, fontWeight: 'bold', fontSize: '18px'}),
+                paragraph(correct ? explanation : 'The correct answer is: ' + explanation,
+                          {color: color})
+            ]}
+        };
+    }
+
+    function errorFeedback() {
+        return paragraph('Error calculating quiz result', {color: 'red'});
+    }
+})();
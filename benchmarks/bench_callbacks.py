@@ -0,0 +1,139 @@
+# Times the server-side Dash callbacks in app.py, called directly in-process.
+# Clientside callbacks (slider ranges, quiz grading) run in the browser and
+# are not covered.
+#
+#   python benchmarks/bench_callbacks.py
+#   python benchmarks/bench_callbacks.py --scale 100 --repeat 500
+import argparse
+
+import numpy as np
+from dash._utils import AttributeDict
+from dash._callback_context import context_value
+
+from common import add_dataset_args, load_app, timed, summarize, report
+
+
+# Callbacks that read dash.ctx need a callback context to run outside a request
+def triggered_by(prop_id, func):
+    token = context_value.set(AttributeDict(triggered_inputs=[{'prop_id': prop_id, 'value': None}]))
+    try:
+        return func()
+    finally:
+        context_value.reset(token)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the app.py server callbacks')
+    add_dataset_args(parser)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = load_app(args.scale)
+    models = app.snapshot.models
+    rng = np.random.default_rng(0)
+
+    # Random but fitted (city, brand, container) inputs and in-range prices
+    fitted = [(city, brand, container)
+              for c, city in enumerate(models.cities)
+              for i, (brand, container) in enumerate(models.products)
+              if not np.isnan(models.own_coef[c, i])]
+
+    def pick():
+        city, brand, container = fitted[rng.integers(len(fitted))]
+        low, high = models.price_range(brand, container, city)
+        return city, brand, container, float(rng.uniform(low, high))
+
+    def pick_pair():
+        city, brand1, container1, _ = pick()
+        _, brand2, container2 = fitted[rng.integers(len(fitted))]
+        low, high = models.price_range(brand2, container2, city)
+        return city, brand1, container1, brand2, container2, float(rng.uniform(low, high))
+
+    def own(live=False, estimator='linear'):
+        city, brand, container, price = pick()
+        if live:
+            return lambda: app.update_own_live_point({'price': price}, brand, container, city, estimator)
+        return lambda: app.calculate_own_price_elasticity(1, brand, container, price, city, estimator)
+
+    def own_bootstrap(estimator):
+        models._bootstraps.clear()
+        return own(estimator=estimator)
+
+    def cross(live=False):
+        city, brand1, container1, brand2, container2, price = pick_pair()
+        if live:
+            return lambda: app.update_cross_live_point({'price': price}, brand1, container1,
+                                                       brand2, container2, city)
+        return lambda: app.calculate_cross_price_elasticity(1, brand1, container1, brand2,
+                                                            container2, price, city)
+
+    def own_live_refresh():
+        city, brand, container, price = pick()
+        return lambda: app.refresh_own_live_figure([brand, container, price, city, 'linear'])
+
+    def price_response(cold):
+        city, brand, container, price = pick()
+        if cold:
+            models._tables.clear()
+        return lambda: (models.own_response(brand, container, price, city),
+                        models.own_optimum(brand, container, city))
+
+    def matrix(cold):
+        city = models.cities[rng.integers(len(models.cities))]
+        if cold:
+            models._matrices.clear()
+        return lambda: app.update_elasticity_matrix(city, 'mean')
+
+    def explorer_page(cold):
+        city, brand, _, price = pick()
+        query = f'{{city}} = {city} && {{price}} > {price:.2f}' if cold else f'{{brand}} = {brand}'
+        sort_by = [{'column_id': 'quantity', 'direction': 'desc'}]
+        if cold:
+            app.snapshot.explorer._masks.clear()
+            app.snapshot.explorer._rows.clear()
+        page = int(rng.integers(20))
+        return lambda: triggered_by('data-preview.page_current', lambda: app.update_data_preview(
+            page, 15, sort_by, query))
+
+    # The background job body, run in-process without the job manager
+    def market_report():
+        models._bootstraps.clear()
+        return lambda: app.market_report(models, 'huber')
+
+    def run(name, make_call, cache=None):
+        # Each sample gets fresh random inputs; only the call itself is timed
+        shared = app.response_cache
+        if cache is not None:
+            app.response_cache = cache
+        try:
+            times = [timed(make_call())[0] for _ in range(args.repeat)]
+        finally:
+            app.response_cache = shared
+        return summarize(name, times)
+
+    # A cache that never keeps anything makes every call a miss
+    no_cache = app.ResponseCache(max_size=0)
+    warm_own, warm_cross = own(), cross()
+    rows = [
+        run('own elasticity, cache miss', own, no_cache),
+        run('own elasticity, cache hit', lambda: warm_own),
+        run('own log-log, cache miss', lambda: own_bootstrap('loglog'), no_cache),
+        run('own Huber, cache miss', lambda: own_bootstrap('huber'), no_cache),
+        run('cross elasticity, cache miss', cross, no_cache),
+        run('cross elasticity, cache hit', lambda: warm_cross),
+        run('own live patch', lambda: own(live=True)),
+        run('cross live patch', lambda: cross(live=True)),
+        run('own live full refresh, cache miss', own_live_refresh, no_cache),
+        run('price response + optimum, build', lambda: price_response(cold=True)),
+        run('price response + optimum, lookup', lambda: price_response(cold=False)),
+        run('elasticity matrix, first call', lambda: matrix(cold=True)),
+        run('elasticity matrix, memoized', lambda: matrix(cold=False)),
+        run('market report, Huber', market_report),
+        run('data explorer, page turn', lambda: explorer_page(cold=False)),
+        run('data explorer, new filter + sort', lambda: explorer_page(cold=True)),
+    ]
+    report(f'Server callbacks (scale {args.scale})', rows, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Times each stage of the import-time data pipeline in app.py.
+#
+#   python benchmarks/bench_pipeline.py              # bundled soda.csv
+#   python benchmarks/bench_pipeline.py --scale 100  # synthetic, 100x the rows
+import time
+import shutil
+import argparse
+import tempfile
+
+import pandas as pd
+
+from common import add_dataset_args, dataset_path, load_app, timed, summarize, report
+
+
+# The original groupby + merge + pivot, kept as a reference point
+def legacy_pivot(df):
+    df_mean_Q = df.groupby(['brand','container','city','date'])['quantity'].mean().reset_index()
+    df_mean_P = df.groupby(['brand','container','city','date'])['price'].mean().reset_index()
+    df_city = pd.merge(df_mean_Q, df_mean_P)
+    df_city.rename(columns={'quantity': 'mean_q', 'price': 'mean_p'}, inplace=True)
+    return df_city.pivot(index='date', columns=['city','brand','container'], values=['mean_q','mean_p'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the app.py data pipeline')
+    add_dataset_args(parser)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    path = dataset_path(args.scale)
+    start = time.perf_counter()
+    app = load_app(args.scale)
+    rows = [summarize('import app', [time.perf_counter() - start])]
+
+    df = app.read_source(path)
+    sales = app.prepare_data(df)
+    series = app.SeriesAccessor(sales)
+
+    def cold_load():
+        app.DATA_CACHE_DIR = tempfile.mkdtemp()
+        try:
+            app.load_data(path)
+        finally:
+            shutil.rmtree(app.DATA_CACHE_DIR)
+
+    def warm_load():
+        app.DATA_CACHE_DIR = warm_dir
+        app.load_data(path)
+
+    warm_dir = tempfile.mkdtemp()
+    app.DATA_CACHE_DIR = warm_dir
+    app.load_data(path)
+
+    stages = [
+        ('read csv', lambda: app.read_source(path)),
+        ('groupby + merge + pivot (legacy)', lambda: legacy_pivot(df)),
+        ('single-pass aggregate', lambda: app.prepare_data(df)),
+        ('series accessor', lambda: app.SeriesAccessor(sales)),
+        ('model store fit', lambda: app.ModelStore(series)),
+        ('load, no cache', cold_load),
+        ('load, memory-mapped cache', warm_load),
+    ]
+    for name, func in stages:
+        rows.append(summarize(name, timed(func, args.repeat)))
+    shutil.rmtree(warm_dir)
+
+    report(f'Data pipeline, {len(df)} rows (scale {args.scale})', rows, args.json)
+
+
+if __name__ == '__main__':
+    main()
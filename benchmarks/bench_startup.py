@@ -0,0 +1,67 @@
+# Times a cold `import app` and the memory it leaves behind, each sample in a
+# fresh interpreter so nothing is already imported. The scikit-learn rows show
+# what the old LinearRegression import cost on top; app.py now only imports
+# it when a scikit-learn estimator is picked.
+#
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --scale 100 --repeat 20
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+import numpy as np
+
+from common import REPO_DIR, WORK_DIR, add_dataset_args, dataset_path, summarize, report
+
+
+# Runs in the child: time the statements, then report the time and peak RSS
+CHILD = '''
+import sys, json, time, resource
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+{statements}
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'seconds': elapsed, 'rss_mb': peak / 1024 / (1024 if sys.platform == 'darwin' else 1)}}))
+'''
+
+
+def run_child(statements, env):
+    code = CHILD.format(repo=REPO_DIR, statements=statements)
+    out = subprocess.run([sys.executable, '-c', code], env=env, cwd=REPO_DIR,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time importing app.py in a fresh interpreter')
+    add_dataset_args(parser)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATA_PATH=dataset_path(args.scale),
+               DATA_CACHE_DIR=os.path.join(WORK_DIR, f'cache_x{args.scale}'))
+    # Build the data cache once so every sample times the same warm load
+    run_child('import app', env)
+
+    stages = [
+        ('import numpy + pandas', 'import numpy, pandas'),
+        ('import sklearn.linear_model', 'import numpy, pandas, sklearn.linear_model'),
+        ('import app', 'import app'),
+        ('import app + sklearn (before)', 'import sklearn.linear_model, app'),
+    ]
+    rows = []
+    for name, statements in stages:
+        samples = [run_child(statements, env) for _ in range(args.repeat)]
+        row = summarize(name, [s['seconds'] for s in samples])
+        # RSS of the child, not of this process
+        row['peak_rss_mb'] = float(np.median([s['rss_mb'] for s in samples]))
+        rows.append(row)
+
+    report(f'Cold start, fresh interpreter (scale {args.scale})', rows, args.json)
+
+
+if __name__ == '__main__':
+    main()
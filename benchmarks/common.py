@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import time
+import resource
+import tempfile
+import importlib
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUNDLED_CSV = os.path.join(REPO_DIR, 'soda.csv')
+WORK_DIR = os.path.join(tempfile.gettempdir(), 'elasticity-bench')
+
+sys.path.insert(0, REPO_DIR)
+
+
+def add_dataset_args(parser):
+    parser.add_argument('--scale', type=int, default=1,
+                        help='1 for the bundled soda.csv, N for a synthetic dataset N times larger')
+    parser.add_argument('--json', metavar='PATH', help='also write the results to a JSON file')
+
+
+# The bundled data repeated `scale` times. Each copy becomes a new set of
+# cities ("Athens 2", ...) with prices and quantities jittered by a few
+# percent, so the result has the same shape as a larger multi-city extract.
+def dataset_path(scale):
+    if scale <= 1:
+        return BUNDLED_CSV
+
+    path = os.path.join(WORK_DIR, f'soda_x{scale}.csv')
+    if not os.path.exists(path):
+        os.makedirs(WORK_DIR, exist_ok=True)
+        base = pd.read_csv(BUNDLED_CSV)
+        rng = np.random.default_rng(0)
+        copies = []
+        for k in range(scale):
+            copy = base.copy()
+            if k:
+                copy['city'] = copy['city'] + f' {k + 1}'
+                copy['price'] = (copy['price'] * rng.normal(1, 0.03, len(copy))).round(2)
+                copy['quantity'] = (copy['quantity'] * rng.normal(1, 0.05, len(copy))).round()
+            copies.append(copy)
+        tmp = path + '.tmp'
+        pd.concat(copies, ignore_index=True).to_csv(tmp, index=False)
+        os.replace(tmp, path)
+    return path
+
+
+# Import app.py against the given dataset, with a cache directory of its own
+# so synthetic runs never touch the app's real cache
+def load_app(scale, cache_dir=None):
+    os.environ['DATA_PATH'] = dataset_path(scale)
+    os.environ['DATA_CACHE_DIR'] = cache_dir or os.path.join(WORK_DIR, f'cache_x{scale}')
+    if 'app' in sys.modules:
+        return importlib.reload(sys.modules['app'])
+    return importlib.import_module('app')
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+def timed(func, repeat=1):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def summarize(name, times, wall=None):
+    times = np.asarray(times) * 1000
+    wall = wall if wall is not None else times.sum() / 1000
+    return {
+        'name': name,
+        'n': len(times),
+        'p50_ms': float(np.percentile(times, 50)),
+        'p95_ms': float(np.percentile(times, 95)),
+        'p99_ms': float(np.percentile(times, 99)),
+        'throughput_per_s': len(times) / wall if wall > 0 else float('inf'),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def report(title, rows, json_path=None):
+    print(f'\n{title}')
+    print(f'{"":34} {"n":>6} {"p50 ms":>10} {"p95 ms":>10} {"p99 ms":>10} {"per s":>10} {"RSS MB":>8}')
+    for row in rows:
+        print(f'{row["name"]:34} {row["n"]:>6} {row["p50_ms"]:>10.3f} {row["p95_ms"]:>10.3f} '
+              f'{row["p99_ms"]:>10.3f} {row["throughput_per_s"]:>10.1f} {row["peak_rss_mb"]:>8.1f}')
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({'title': title, 'results': rows}, f, indent=2)
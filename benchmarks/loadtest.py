@@ -0,0 +1,162 @@
+# Concurrent HTTP load test of the Dash callback endpoint.
+#
+# By default app.server is started in-process on a free port with a threaded
+# werkzeug server; pass --url to drive an already running server instead,
+# e.g. gunicorn. Payloads are built from /_dash-dependencies, so they match
+# whatever callbacks that server has registered. Quiz grading and slider
+# ranges are clientside callbacks and never reach the server.
+#
+#   python benchmarks/loadtest.py --concurrency 40 --requests 2000
+#   python benchmarks/loadtest.py --url http://127.0.0.1:8000
+import json
+import time
+import logging
+import argparse
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from common import add_dataset_args, load_app, summarize, report
+
+
+def fetch(url, payload=None):
+    data = None if payload is None else json.dumps(payload).encode()
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        return resp.status, resp.read()
+
+
+def find_callback(dependencies, first_output):
+    for dep in dependencies:
+        if dep['output'].lstrip('.').startswith(first_output):
+            return dep
+    raise KeyError(first_output)
+
+
+def update_payload(dep, values, changed):
+    def props(items):
+        return [{'id': item['id'], 'property': item['property'],
+                 'value': values.get(f'{item["id"]}.{item["property"]}')} for item in items]
+
+    outputs = [{'id': o.split('.')[0], 'property': o.split('.')[1].split('@')[0]}
+               for o in dep['output'].strip('.').split('...')]
+    return {'output': dep['output'],
+            'outputs': outputs if dep['output'].startswith('..') else outputs[0],
+            'inputs': props(dep['inputs']),
+            'state': props(dep['state']),
+            'changedPropIds': [changed]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Dash callback endpoint')
+    add_dataset_args(parser)
+    parser.add_argument('--url', help='base URL of a running server (default: start one in-process)')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=1000, help='requests per scenario')
+    args = parser.parse_args()
+
+    if args.url:
+        base = args.url.rstrip('/')
+        measure_rss = False
+    else:
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        app = load_app(args.scale)
+        server = make_server('127.0.0.1', 0, app.server, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{server.server_port}'
+        measure_rss = True
+
+    _, body = fetch(f'{base}/_dash-dependencies')
+    dependencies = json.loads(body)
+    _, body = fetch(f'{base}/_dash-layout')
+
+    # Price ranges come from the layout's price-ranges store, as in the browser
+    ranges = {}
+    for child in json.loads(body)['props']['children']:
+        if child.get('props', {}).get('id') == 'price-ranges':
+            ranges = child['props']['data']
+    products = [(city, brand, container, low, high)
+                for city, brands in ranges.items()
+                for brand, containers in brands.items()
+                for container, (low, high) in containers.items()]
+
+    rng = np.random.default_rng(0)
+    rng_lock = threading.Lock()
+
+    def pick():
+        with rng_lock:
+            city, brand, container, low, high = products[rng.integers(len(products))]
+            return city, brand, container, float(rng.uniform(low, high))
+
+    own = find_callback(dependencies, 'own-elasticity-output.children...own-price-graph')
+    cross = find_callback(dependencies, 'cross-elasticity-output.children...cross-price-graph')
+    own_live = find_callback(dependencies, 'own-price-graph.figure@')
+
+    def own_request():
+        city, brand, container, price = pick()
+        return update_payload(own, {
+            'own-elasticity-button.n_clicks': 1, 'own-brand-dropdown.value': brand,
+            'own-container-dropdown.value': container, 'own-price-slider.value': price,
+            'own-city-dropdown.value': city, 'own-estimator-radio.value': 'linear'},
+            'own-elasticity-button.n_clicks')
+
+    def cross_request():
+        city, brand1, container1, _ = pick()
+        _, brand2, container2, price = pick()
+        return update_payload(cross, {
+            'cross-elasticity-button.n_clicks': 1, 'cross-brand1-dropdown.value': brand1,
+            'cross-container1-dropdown.value': container1, 'cross-brand2-dropdown.value': brand2,
+            'cross-container2-dropdown.value': container2, 'cross-price-slider.value': price,
+            'cross-city-dropdown.value': city}, 'cross-elasticity-button.n_clicks')
+
+    def own_live_request():
+        city, brand, container, price = pick()
+        return update_payload(own_live, {
+            'own-live-price.data': {'price': price}, 'own-brand-dropdown.value': brand,
+            'own-container-dropdown.value': container, 'own-city-dropdown.value': city,
+            'own-estimator-radio.value': 'linear'}, 'own-live-price.data')
+
+    def matrix_request():
+        city, _, _, _ = pick()
+        return f'/api/elasticity-matrix?city={urllib.request.quote(city)}&policy=mean'
+
+    # The default slider position every student starts from
+    default_own = own_request()
+
+    scenarios = [
+        ('own elasticity (random inputs)', own_request),
+        ('own elasticity (same inputs)', lambda: default_own),
+        ('cross elasticity (random inputs)', cross_request),
+        ('own live patch', own_live_request),
+        ('elasticity matrix API', matrix_request),
+    ]
+
+    rows = []
+    for name, make_request in scenarios:
+        def one(_):
+            request = make_request()
+            start = time.perf_counter()
+            if isinstance(request, str):
+                status, _ = fetch(base + request)
+            else:
+                status, _ = fetch(f'{base}/_dash-update-component', request)
+            if status >= 400:
+                raise RuntimeError(f'{name}: HTTP {status}')
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            times = list(pool.map(one, range(args.requests)))
+        row = summarize(name, times, wall=time.perf_counter() - start)
+        if not measure_rss:
+            row['peak_rss_mb'] = float('nan')
+        rows.append(row)
+
+    report(f'HTTP load test, concurrency {args.concurrency} (scale {args.scale})', rows, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# Production server settings: gunicorn picks this file up from the working
+# directory, or pass it with --config.
+#
+# The app is preloaded, so the dataset and fitted models are built once in the
+# master and shared by every forked worker (see create_app in app.py). Worker
+# and thread counts scale with the cores available to this process; override
+# them with WEB_CONCURRENCY and GUNICORN_THREADS.
+import os
+import math
+
+
+# Cores this process may run on, further limited by a cgroup v2 CPU quota
+# ("<quota> <period>" in cpu.max, or "max" when unlimited) as containers set
+def available_cores():
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+    except (OSError, ValueError):
+        return cores
+    if quota == 'max':
+        return cores
+    return max(1, min(cores, math.ceil(int(quota) / int(period))))
+
+
+wsgi_app = 'app:create_app()'
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+preload_app = True
+
+# Callbacks are mostly short NumPy work that releases the GIL only in part, so
+# processes carry the parallelism and a few threads per worker cover requests
+# waiting on I/O
+workers = int(os.environ.get('WEB_CONCURRENCY', available_cores() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = 5
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+
+
+# Start each worker's data watcher as soon as it is up, rather than on its
+# first request, so admin reloads reach idle workers too
+def post_worker_init(worker):
+    from app import reloader
+    reloader.watch()
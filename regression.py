@@ -0,0 +1,121 @@
+# Least-squares solvers for the elasticity models, in plain NumPy. Solvers
+# are batched over leading axes, so many small regressions (every product,
+# every product pair, every bootstrap resample) are solved in one call.
+# scikit-learn is only imported, lazily, for the optional estimators in
+# SKLEARN_ESTIMATORS.
+import importlib.util
+
+import numpy as np
+
+# Least squares for a stack of small regressions solved together. X has shape
+# (..., T, k), y (..., T) and mask (..., T) marks the usable observations;
+# optional weights (..., T) make it weighted least squares. Like
+# LinearRegression the data is centered first, and the pseudo-inverse gives
+# the minimum-norm solution when regressors are collinear.
+def batched_ols(X, y, mask, weights=None):
+    w = mask.astype(float) if weights is None else np.where(mask, weights, 0.0)
+    n = mask.sum(axis=-1)
+    X = np.where(mask[..., None], X, 0.0)
+    y = np.where(mask, y, 0.0)
+
+    safe_w = np.maximum(w.sum(axis=-1), np.finfo(float).tiny)
+    x_mean = (X * w[..., None]).sum(axis=-2) / safe_w[..., None]
+    y_mean = (y * w).sum(axis=-1) / safe_w
+    root_w = np.sqrt(w)
+    Xc = (X - x_mean[..., None, :]) * root_w[..., None]
+    yc = (y - y_mean[..., None]) * root_w
+
+    Xt = np.swapaxes(Xc, -1, -2)
+    if X.shape[-1] == 1:
+        # One regressor: the normal equations are scalar, and a constant
+        # regressor gets slope 0 as the pseudo-inverse would give
+        sxx, sxy = (Xt @ Xc)[..., 0], (Xt @ yc[..., None])[..., 0]
+        coef = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=sxx > 0)
+    else:
+        coef = (np.linalg.pinv(Xt @ Xc) @ (Xt @ yc[..., None]))[..., 0]
+    intercept = y_mean - (coef * x_mean).sum(axis=-1)
+
+    too_few = n <= X.shape[-1]
+    coef[too_few] = np.nan
+    intercept[too_few] = np.nan
+    return coef, intercept
+
+# Huber M-estimator by iteratively reweighted least squares, batched like
+# batched_ols. The scale is a robust standard deviation (MAD / 0.6745) of the
+# OLS residuals, held fixed while residuals beyond k of it are down-weighted,
+# so a few outlying weeks can't drag the fit.
+def batched_huber(X, y, mask, k=1.345, iterations=50, tol=1e-4):
+    median = np.median if mask.all() else np.nanmedian
+
+    def residuals(coef, intercept):
+        return np.where(mask, y - intercept[..., None] - (X * coef[..., None, :]).sum(axis=-1), np.nan)
+
+    coef, intercept = batched_ols(X, y, mask)
+    with np.errstate(invalid='ignore'):
+        resid = residuals(coef, intercept)
+        center = median(resid, axis=-1)
+        bound = k * median(np.abs(resid - center[..., None]), axis=-1)[..., None] / 0.6745
+
+    for _ in range(iterations):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            size = np.abs(resid)
+            weights = np.where(size > bound, bound / size, 1.0)
+        weights = np.where(np.isfinite(weights), weights, 1.0)
+        new_coef, intercept = batched_ols(X, y, mask, weights)
+        step = np.abs(new_coef - coef) / (np.abs(coef) + 1e-12)
+        coef = new_coef
+        if not np.nanmax(step, initial=0.0) > tol:
+            break
+        resid = residuals(coef, intercept)
+    return coef, intercept
+
+# Own-price demand models. Linear and Huber fit Q = a + b * P; log-log fits
+# log Q = a + b * log P, i.e. Q = e^a * P^b with constant elasticity b.
+# Batched estimators are fitted for every series at once; the scikit-learn
+# ones one series at a time, and only when scikit-learn is installed.
+BATCHED_ESTIMATORS = {'linear': 'Linear', 'loglog': 'Log-log (constant elasticity)',
+                      'huber': 'Huber (robust linear)'}
+SKLEARN_ESTIMATORS = {'theilsen': 'Theil-Sen (scikit-learn)'}
+
+def sklearn_available():
+    return importlib.util.find_spec('sklearn') is not None
+
+def fit_own(estimator, P, Q, mask):
+    if estimator == 'loglog':
+        mask = mask & (P > 0) & (Q > 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            coef, intercept = batched_ols(np.log(P)[..., None], np.log(Q), mask)
+    elif estimator == 'huber':
+        coef, intercept = batched_huber(P[..., None], Q, mask)
+    else:
+        coef, intercept = batched_ols(P[..., None], Q, mask)
+    return coef[..., 0], intercept
+
+def predict_own(estimator, coef, intercept, price):
+    if estimator == 'loglog':
+        return np.exp(intercept) * price ** coef
+    return intercept + coef * price
+
+def own_elasticity_at(estimator, coef, intercept, price):
+    if estimator == 'loglog':
+        return coef + 0.0 * price
+    return coef * price / predict_own(estimator, coef, intercept, price)
+
+# (quantity, elasticity, revenue) of an own-price model at the given prices
+def own_response_at(estimator, coef, intercept, price):
+    quantity = predict_own(estimator, coef, intercept, price)
+    return quantity, own_elasticity_at(estimator, coef, intercept, price), price * quantity
+
+def fit_own_sklearn(estimator, P, Q):
+    from sklearn.linear_model import TheilSenRegressor
+
+    models = {'theilsen': lambda: TheilSenRegressor(random_state=0)}
+    model = models[estimator]().fit(np.asarray(P, dtype=float)[:, None], Q)
+    return float(model.coef_[0]), float(model.intercept_)
+
+# Bootstrap resamples per own-price fit. Every resample of a series is drawn
+# at once and all of them are solved as one batch.
+def bootstrap_own(estimator, P, Q, replicates, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(len(P), size=(replicates, len(P)))
+    return fit_own(estimator, P[rows], Q[rows], np.ones(rows.shape, dtype=bool))